@@ -0,0 +1,135 @@
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sim import display as sim_display, gpio as sim_gpio
+
+sim_display.install()
+sim_gpio.install()
+
+import displayio
+import terminalio
+from adafruit_display_text.bitmap_label import Label
+
+from controller.menu import display
+
+ROUNDS = 200
+
+
+OPEN_LABELS = (
+    (1, 0, "Open now"),
+    (1, 1, "Duration"),
+    (1, 2, "Speed"),
+    (1, 3, "Hour"),
+    (1, 4, "Minute"),
+    (1, 5, "Repeat count"),
+    (1, 6, "Repeat every"),
+    (20, 1, "s"),
+    (20, 2, "%"),
+    (20, 6, "m"),
+)
+
+SYSTEM_LABELS = (
+    (1, 0, "System hour"),
+    (1, 1, "System minute"),
+    (1, 2, "Boot report"),
+    (1, 3, "History"),
+    (1, 4, "Diagnostics"),
+)
+
+
+def make_options_frame(position, labels=OPEN_LABELS):
+    # Same layout as the options scene of a page, as its static layer and the
+    # cursor and values drawn on every frame
+    return labels, ((0, position, "*"),) + (
+        (16, 1, "12O"),
+        (16, 2, "1OO"),
+        (16, 3, "O6"),
+        (16, 4, "3O"),
+        (16, 5, "3"),
+        (16, 6, "6O"),
+    )
+
+
+def make_cursor_frames():
+    return [make_options_frame(idx % 7) for idx in range(ROUNDS)]
+
+
+def make_page_frames():
+    pages = (OPEN_LABELS, SYSTEM_LABELS)
+    return [make_options_frame(0, pages[idx % 2]) for idx in range(ROUNDS)]
+
+
+def render_immediate(layer, commands):
+    # Renderer used up to firmware v0.3: new group and labels on every frame
+    group = displayio.Group()
+
+    for x, y, text in layer + commands:
+        label = Label(terminalio.FONT, text=text, color=0xFFFFFF)
+        label.x = int(display.FONT_WIDTH * x)
+        label.y = int(display.FONT_HEIGHT * (y + 0.5))
+
+        group.append(label)
+
+    display.get_display().show(group)
+
+
+def render_retained(layer, commands):
+    # Labels kept between renders, static text included
+    display.render((), layer + commands)
+
+
+def measure(render, frames):
+    render(*frames[-1])
+
+    allocations = sim_display.Bitmap.allocations
+    allocated_bytes = sim_display.Bitmap.allocated_bytes
+
+    tracemalloc.start()
+    start = time.perf_counter_ns()
+
+    for layer, commands in frames:
+        render(layer, commands)
+
+    elapsed = time.perf_counter_ns() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return (
+        elapsed / ROUNDS / 1000,
+        (sim_display.Bitmap.allocations - allocations) / ROUNDS,
+        (sim_display.Bitmap.allocated_bytes - allocated_bytes) / ROUNDS,
+        peak,
+    )
+
+
+def main():
+    display.init()
+
+    for title, frames in (
+        ("Options scene cursor moves", make_cursor_frames()),
+        ("Switches between two options pages", make_page_frames()),
+    ):
+        print(f"{title}, {ROUNDS} frames")
+        print(
+            f"{'':10} {'time [us]':>10} {'bitmaps':>10} "
+            f"{'bitmap [B]':>10} {'peak [B]':>10}"
+        )
+
+        for name, render in (
+            ("immediate", render_immediate),
+            ("retained", render_retained),
+            ("layered", display.render),
+        ):
+            elapsed, allocations, allocated_bytes, peak = measure(render, frames)
+            print(
+                f"{name:10} {elapsed:>10.1f} {allocations:>10.1f} "
+                f"{allocated_bytes:>10.0f} {peak:>10d}"
+            )
+
+
+if __name__ == "__main__":
+    main()
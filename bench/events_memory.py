@@ -0,0 +1,97 @@
+import gc
+import os
+import sys
+
+# Runs on the board as well, where gc.mem_free() reports the free heap. On the
+# host, tracemalloc stands in for it.
+
+if hasattr(gc, "mem_free"):
+    tracemalloc = None
+else:
+    import tracemalloc
+
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from controller import constants
+from controller.core import events, heap
+
+MOTOR_IDS = (constants.MOTOR_OPEN_ID, constants.MOTOR_CLOSE_ID)
+CAPACITY = len(MOTOR_IDS) * (constants.COUNT_MAX + 1)
+
+BASE_TIMESTAMP = 1704110400
+
+
+class Event:
+    # Event store used up to firmware v0.3, one object per scheduled event
+    def __init__(self, *, motor_id, timestamp, duration, speed, oneshot=False):
+        self.motor_id = motor_id
+        self.timestamp = timestamp
+        self.duration = duration
+        self.speed = speed
+        self.oneshot = oneshot
+
+
+def get_timestamp(event):
+    return event.timestamp
+
+
+def fill_objects():
+    data = []
+
+    for motor_id in MOTOR_IDS:
+        for it in range(constants.COUNT_MAX):
+            event = Event(
+                motor_id=motor_id,
+                timestamp=BASE_TIMESTAMP + 60 * it,
+                duration=constants.DURATION_MAX,
+                speed=constants.SPEED_MAX,
+            )
+            heap.push(data, event, get_timestamp)
+
+    return data
+
+
+def fill_table():
+    data = events.EventTable(MOTOR_IDS, CAPACITY)
+    data.clear(base=BASE_TIMESTAMP)
+
+    for motor_id in MOTOR_IDS:
+        for it in range(constants.COUNT_MAX):
+            data.add(
+                motor_id,
+                BASE_TIMESTAMP + 60 * it,
+                constants.DURATION_MAX,
+                constants.SPEED_MAX,
+            )
+
+    return data
+
+
+def measure(fill):
+    gc.collect()
+
+    if tracemalloc is None:
+        before = gc.mem_free()
+        data = fill()
+        gc.collect()
+        used = before - gc.mem_free()
+    else:
+        tracemalloc.start()
+        data = fill()
+        gc.collect()
+        used, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return used, len(data)
+
+
+def main():
+    objects_used, count = measure(fill_objects)
+    table_used, _ = measure(fill_table)
+
+    print(f"Event store holding {count} events")
+    print(f"objects: {objects_used:7d} bytes")
+    print(f"table:   {table_used:7d} bytes")
+
+
+main()
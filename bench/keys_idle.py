@@ -0,0 +1,55 @@
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sim import gpio as sim_gpio, keypad as sim_keypad
+
+sim_gpio.install()
+sim_keypad.install()
+
+from controller.menu import keys
+
+DURATION = 3.0
+
+
+async def poll_busy():
+    # Menu loop used up to firmware v0.3
+    while True:
+        event = keys.device.events.get()
+        if event and event.pressed:
+            pass
+        await asyncio.sleep(0)
+
+
+async def poll_adaptive():
+    while True:
+        await keys.wait_for_events()
+
+
+async def measure(poll):
+    keys.reset_stats()
+    task = asyncio.create_task(poll())
+
+    start_cpu = time.process_time()
+    await asyncio.sleep(DURATION)
+    cpu = time.process_time() - start_cpu
+
+    task.cancel()
+    return cpu / DURATION, keys.stats["polls"]
+
+
+async def main():
+    busy_cpu, _ = await measure(poll_busy)
+    adaptive_cpu, adaptive_polls = await measure(poll_adaptive)
+
+    print(f"Idle menu task over {DURATION} s")
+    print(f"busy loop:     {100 * busy_cpu:5.1f} % CPU")
+    print(f"adaptive poll: {100 * adaptive_cpu:5.1f} % CPU, {adaptive_polls} polls")
+    print(f"adaptive poll: {100 * keys.get_duty_cycle():5.2f} % duty cycle")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,105 @@
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sim import nvm as sim_nvm
+
+device = sim_nvm.install()
+
+from controller import constants
+from controller.core import codec, nvm
+
+ROUNDS = 200
+
+SETTINGS = {
+    constants.MOTOR_OPEN_ID: {
+        constants.DURATION_KEY: 120,
+        constants.SPEED_KEY: 80,
+        constants.HOUR_KEY: 6,
+        constants.MINUTE_KEY: 30,
+        constants.COUNT_KEY: 3,
+        constants.RATE_KEY: 60,
+    },
+    constants.MOTOR_CLOSE_ID: {
+        constants.DURATION_KEY: 900,
+        constants.SPEED_KEY: 100,
+        constants.HOUR_KEY: 21,
+        constants.MINUTE_KEY: 45,
+        constants.COUNT_KEY: 1,
+        constants.RATE_KEY: 60,
+    },
+}
+
+
+# Single JSON blob at offset 0, as written by firmware v0.3
+
+
+def read_json_blob():
+    hi, lo = device[0:2]
+    return json.loads(device[2 : 2 + hi * (1 << 8) + lo].decode())
+
+
+def write_json_blob(data):
+    raw_bytes = json.dumps(data, separators=(",", ":")).encode()
+    device[0 : len(raw_bytes) + 2] = bytes(divmod(len(raw_bytes), 1 << 8)) + raw_bytes
+
+
+def reset_device():
+    device[0 : len(device)] = bytes((sim_nvm.ERASED,)) * len(device)
+    device.reset_counters()
+
+
+def measure_decode(read):
+    start = time.perf_counter_ns()
+    for _ in range(ROUNDS):
+        read()
+
+    return (time.perf_counter_ns() - start) / ROUNDS / 1000
+
+
+def measure_save(write, data):
+    data[constants.MOTOR_OPEN_ID][constants.DURATION_KEY] += 1
+
+    device.reset_counters()
+    write(data)
+
+    return device.get_report()["bytes_written"]
+
+
+def run_json():
+    reset_device()
+
+    data = json.loads(json.dumps(SETTINGS))
+    write_json_blob(data)
+
+    return measure_decode(read_json_blob), measure_save(write_json_blob, data)
+
+
+def run_binary():
+    reset_device()
+
+    data = json.loads(json.dumps(SETTINGS))
+    nvm._bank = None
+    nvm.write_nvm(data)
+
+    return measure_decode(nvm.read_nvm), measure_save(nvm.write_nvm, data)
+
+
+def main():
+    with contextlib.redirect_stdout(io.StringIO()):
+        json_results = run_json()
+        binary_results = run_binary()
+
+    print(f"Binary format version {codec.FORMAT_VERSION}, {ROUNDS} rounds")
+    print(f"{'':8} {'decode [us]':>12} {'bytes/save':>12}")
+    print(f"{'json':8} {json_results[0]:>12.1f} {json_results[1]:>12d}")
+    print(f"{'binary':8} {binary_results[0]:>12.1f} {binary_results[1]:>12d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import sim
+
+device = sim.install()
+sim.clock.clock.set_time(time.mktime((2024, 1, 1, 12, 0, 0, -1, -1, -1)) // 1)
+
+from controller import constants
+from controller.core import motor, nvm, rtc, scheduler, state
+from controller.menu import menu, scenes
+from controller.service import control
+
+rtc.init()
+
+BASELINE_PATH = os.path.join(ROOT, "bench", "baseline.json")
+
+MOTOR_IDS = (constants.MOTOR_OPEN_ID, constants.MOTOR_CLOSE_ID)
+
+# Rounds run before measuring, so lazily created objects and caches are warm
+WARMUP_ROUNDS = 20
+
+# Timed rounds go on for at least this long, as the host can be slowed down
+# for tens of milliseconds at a time
+MIN_TIMING_NS = 500_000_000
+
+# Differences below these are host noise for a single call, whatever the ratio
+NOISE_FLOORS = {
+    "time_us": 10,
+    "alloc_bytes": 64,
+}
+
+benchmarks = {}
+
+
+def benchmark(name, rounds=500):
+    def decorator(function):
+        benchmarks[name] = (function, rounds)
+        return function
+
+    return decorator
+
+
+def load_full_schedule():
+    for motor_id in MOTOR_IDS:
+        state.data[motor_id] = {
+            constants.DURATION_KEY: constants.DURATION_MAX,
+            constants.SPEED_KEY: constants.SPEED_MAX,
+            constants.HOUR_KEY: constants.HOUR_MIN,
+            constants.MINUTE_KEY: constants.MINUTE_MIN,
+            constants.COUNT_KEY: constants.COUNT_MAX,
+            constants.RATE_KEY: constants.RATE_MIN,
+        }
+
+
+@benchmark("scheduler.init")
+def bench_scheduler_init():
+    load_full_schedule()
+    return scheduler.init
+
+
+@benchmark("scheduler.tick")
+def bench_scheduler_tick():
+    load_full_schedule()
+    scheduler.init()
+
+    def setup():
+        # Make the earliest event due and keep the motor queues empty
+        slot = scheduler.data.pop()
+        scheduler.data.reschedule(slot, sim.clock.clock.time() - 1)
+        for channel in motor.channels.values():
+            channel.queue.clear()
+
+    return scheduler.tick, setup
+
+
+@benchmark("nvm.write_read")
+def bench_nvm_round_trip():
+    load_full_schedule()
+    nvm.write_nvm(state.data)
+    values = state.data[constants.MOTOR_OPEN_ID]
+
+    def round_trip():
+        values[constants.DURATION_KEY] = values[constants.DURATION_KEY] % 900 + 1
+        nvm.write_nvm(state.data)
+        nvm.read_nvm()
+
+    return round_trip
+
+
+@benchmark("control.set_duration")
+def bench_set_duration():
+    load_full_schedule()
+    scheduler.init()
+    values = iter(range(1_000_000))
+
+    def set_duration():
+        control.set_duration(constants.MOTOR_OPEN_ID, next(values) % 900 + 1)
+
+    return set_duration
+
+
+@benchmark("control.set_hour")
+def bench_set_hour():
+    load_full_schedule()
+    scheduler.init()
+    values = iter(range(1_000_000))
+
+    def set_hour():
+        control.set_hour(constants.MOTOR_OPEN_ID, next(values) % 24)
+
+    return set_hour
+
+
+def make_render_benchmark(node):
+    def bench_render():
+        load_full_schedule()
+        manager = scenes.SceneManager()
+        empty_scene = manager.current_scene
+        scene = manager.get_scene(node)
+        scene.enter(empty_scene)
+
+        def setup():
+            manager.current_scene = empty_scene
+            manager.draw()
+            manager.current_scene = scene
+
+        return manager.draw, setup
+
+    return bench_render
+
+
+def get_menu_nodes():
+    yield "idle", None
+
+    for page in menu.PAGES:
+        yield page.key, page
+
+        for item in page.items:
+            yield f"{page.key}.{item.key}", item
+
+
+for node_name, node in get_menu_nodes():
+    benchmark(f"render.{node_name}", rounds=200)(make_render_benchmark(node))
+
+
+def run_rounds(operation, setup, rounds, measure):
+    samples = []
+
+    for _ in range(rounds):
+        if setup is not None:
+            setup()
+
+        samples.append(measure(operation))
+
+    return samples
+
+
+def run_timed_rounds(operation, setup, rounds):
+    # At least the given rounds, and more until the minimum time has passed
+    timings = []
+    end_ns = time.perf_counter_ns() + MIN_TIMING_NS
+
+    while len(timings) < rounds or time.perf_counter_ns() < end_ns:
+        timings += run_rounds(operation, setup, 10, measure_time)
+
+    return timings
+
+
+def measure_time(operation):
+    start_ns = time.perf_counter_ns()
+    operation()
+    return time.perf_counter_ns() - start_ns
+
+
+def measure_alloc(operation):
+    tracemalloc.reset_peak()
+    start_memory, _ = tracemalloc.get_traced_memory()
+    operation()
+    return tracemalloc.get_traced_memory()[1] - start_memory
+
+
+def run_benchmark(function, rounds):
+    prepared = function()
+    operation, setup = prepared if isinstance(prepared, tuple) else (prepared, None)
+
+    run_rounds(operation, setup, WARMUP_ROUNDS, measure_time)
+
+    # Timings are taken without tracing and garbage collection, allocations in
+    # a separate pass. The fastest round is the one least disturbed by the host.
+    gc.disable()
+    try:
+        timings = run_timed_rounds(operation, setup, rounds)
+    finally:
+        gc.enable()
+
+    tracemalloc.start()
+    peaks = run_rounds(operation, setup, rounds, measure_alloc)
+    tracemalloc.stop()
+
+    return {
+        "time_us": min(timings) / 1000,
+        "alloc_bytes": statistics.median(peaks),
+    }
+
+
+def measure(function, rounds):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return run_benchmark(function, rounds)
+
+
+def compare(name, result, baseline, threshold):
+    if (previous := baseline.get(name)) is None:
+        return []
+
+    regressions = []
+    for metric, value in result.items():
+        limit = previous[metric] * (1 + threshold)
+        if value > limit and value - previous[metric] > NOISE_FLOORS[metric]:
+            regressions.append(f"{metric} {previous[metric]:.1f} -> {value:.1f}")
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark firmware hot paths")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save", action="store_true", help="overwrite the baseline")
+    parser.add_argument("--threshold", type=float, default=0.5)
+    parser.add_argument("--filter", default="", help="only run matching benchmarks")
+    args = parser.parse_args()
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    results = {}
+    failed = False
+
+    for name, (function, rounds) in benchmarks.items():
+        if args.filter in name:
+            results[name] = measure(function, rounds)
+
+    # The host can be slowed down for seconds, so suspected regressions are
+    # measured again after the other benchmarks and the better run counts
+    for name, result in results.items():
+        if compare(name, result, baseline, args.threshold):
+            retry = measure(*benchmarks[name])
+            for metric, value in retry.items():
+                result[metric] = min(result[metric], value)
+
+    print(f"{'benchmark':36} {'time [us]':>10} {'alloc [B]':>10}")
+
+    for name, result in results.items():
+        regressions = compare(name, result, baseline, args.threshold)
+        failed = failed or bool(regressions)
+
+        line = f"{name:36} {result['time_us']:>10.1f} {result['alloc_bytes']:>10.0f}"
+        if regressions:
+            line += "  REGRESSION: " + ", ".join(regressions)
+
+        print(line)
+
+    if args.save:
+        baseline.update(results)
+
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+
+        print(f"Saved baseline to {args.baseline}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
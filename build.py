@@ -0,0 +1,230 @@
+import argparse
+import importlib
+import os
+import select
+import subprocess
+import sys
+import time
+import tty
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+BUILD_DIR = os.path.join(ROOT, "build")
+PACKAGE = "controller"
+CATALOG_DIR = os.path.join(PACKAGE, "menu", "locales")
+
+# The bytecode format has to match the firmware running on the board
+CIRCUITPYTHON_VERSION = "7.3.3"
+MPY_VERSION = 5
+
+BOOT_MARKER = b"Boot to first frame:"
+
+
+def find_sources():
+    for directory, _, files in os.walk(os.path.join(ROOT, PACKAGE)):
+        for name in sorted(files):
+            if name.endswith(".py"):
+                yield os.path.relpath(os.path.join(directory, name), ROOT)
+
+
+def find_catalogs():
+    for name in sorted(os.listdir(os.path.join(ROOT, CATALOG_DIR))):
+        if name.endswith(".txt"):
+            yield os.path.join(CATALOG_DIR, name)
+
+
+def get_module_name(source):
+    module = source[: -len(".py")].replace(os.sep, ".")
+    return module[: -len(".__init__")] if module.endswith(".__init__") else module
+
+
+def check_compiler(mpy_cross):
+    try:
+        result = subprocess.run(
+            [mpy_cross, "--version"], capture_output=True, text=True, check=True
+        )
+    except (OSError, subprocess.CalledProcessError) as e:
+        sys.exit(f"Cannot run {mpy_cross}: {e}")
+
+    if f"CircuitPython {CIRCUITPYTHON_VERSION}" not in result.stdout:
+        sys.exit(
+            f"{mpy_cross} does not match CircuitPython {CIRCUITPYTHON_VERSION}: "
+            f"{result.stdout.strip()}"
+        )
+
+
+def compile_source(mpy_cross, source):
+    target = os.path.join(BUILD_DIR, source[: -len(".py")] + ".mpy")
+    source_path = os.path.join(ROOT, source)
+
+    if os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(
+        source_path
+    ):
+        return target, False
+
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    subprocess.run([mpy_cross, "-o", target, "-s", source, source_path], check=True)
+
+    return target, True
+
+
+def compile_catalog(source, sources):
+    # Catalogs are checked and copied without comments. The font only covers
+    # ASCII, and a translation of a string no module uses is most likely stale.
+    texts = set()
+    lines = []
+
+    with open(os.path.join(ROOT, source), encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            line = line.rstrip("\r\n")
+            if not line or line.startswith("#"):
+                continue
+
+            parts = line.split("\t")
+            if len(parts) != 2 or not all(parts) or not line.isascii():
+                sys.exit(f"{source}:{number}: expected ASCII 'text<TAB>translation'")
+            if parts[0] in texts:
+                sys.exit(f"{source}:{number}: duplicate translation of {parts[0]!r}")
+
+            texts.add(parts[0])
+            lines.append(f"{line}\n")
+
+    for text in texts:
+        if not any(f'"{text}"' in code for code in sources.values()):
+            print(f"Warning: {source} translates unused string {text!r}")
+
+    target = os.path.join(BUILD_DIR, source)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+
+    with open(target, "w", encoding="utf-8", newline="\n") as f:
+        f.writelines(lines)
+
+    return target
+
+
+def read_sources(sources):
+    code = {}
+
+    for source in sources:
+        with open(os.path.join(ROOT, source), encoding="utf-8") as f:
+            code[source] = f.read()
+
+    return code
+
+
+def verify_bytecode(target):
+    with open(target, "rb") as f:
+        header = f.read(2)
+
+    if header != bytes((ord("M"), MPY_VERSION)):
+        sys.exit(f"{target} is not a version {MPY_VERSION} .mpy file")
+
+
+def verify_imports(sources):
+    # The board cannot be scripted from here, so the same sources are imported
+    # on the simulated hardware to catch missing modules and import cycles
+    sys.path.insert(0, ROOT)
+
+    import sim
+
+    sim.install()
+
+    for source in sources:
+        importlib.import_module(get_module_name(source))
+
+
+def remove_stale(sources, catalogs):
+    expected = {
+        os.path.join(BUILD_DIR, source[: -len(".py")] + ".mpy") for source in sources
+    }
+    expected.update(os.path.join(BUILD_DIR, catalog) for catalog in catalogs)
+
+    for directory, _, files in os.walk(os.path.join(BUILD_DIR, PACKAGE)):
+        for name in files:
+            if (path := os.path.join(directory, name)) not in expected:
+                print(f"Removing stale {os.path.relpath(path, ROOT)}")
+                os.remove(path)
+
+
+def build(mpy_cross):
+    check_compiler(mpy_cross)
+    sources = sorted(find_sources())
+    catalogs = list(find_catalogs())
+    remove_stale(sources, catalogs)
+
+    print(f"{'module':40} {'source [B]':>10} {'mpy [B]':>10}")
+
+    source_total = 0
+    target_total = 0
+
+    for source in sources:
+        target, changed = compile_source(mpy_cross, source)
+        verify_bytecode(target)
+
+        source_size = os.path.getsize(os.path.join(ROOT, source))
+        target_size = os.path.getsize(target)
+        source_total += source_size
+        target_total += target_size
+
+        marker = "  compiled" if changed else ""
+        print(f"{source:40} {source_size:10d} {target_size:10d}{marker}")
+
+    code = read_sources(sources)
+
+    for catalog in catalogs:
+        target = compile_catalog(catalog, code)
+
+        source_size = os.path.getsize(os.path.join(ROOT, catalog))
+        target_size = os.path.getsize(target)
+        source_total += source_size
+        target_total += target_size
+
+        print(f"{catalog:40} {source_size:10d} {target_size:10d}")
+
+    print(f"{'total':40} {source_total:10d} {target_total:10d}")
+
+    verify_imports(sources)
+    print(f"Bundle of {len(sources)} modules imports cleanly")
+
+
+def measure_boot(port, timeout):
+    # A soft reboot restarts code.py, which reports when the first frame is shown
+    fd = os.open(port, os.O_RDWR | os.O_NOCTTY)
+    tty.setraw(fd)
+
+    try:
+        os.write(fd, b"\x03\x04")
+
+        output = b""
+        deadline = time.monotonic() + timeout
+
+        while (remaining := deadline - time.monotonic()) > 0:
+            if not select.select([fd], [], [], remaining)[0]:
+                continue
+
+            output += os.read(fd, 1024)
+
+            if (start := output.find(BOOT_MARKER)) >= 0 and b"\n" in output[start:]:
+                line = output[start:].split(b"\n")[0].decode().strip()
+                print(line)
+                return
+    finally:
+        os.close(fd)
+
+    sys.exit(f"No boot report on {port} within {timeout} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile controller to .mpy")
+    parser.add_argument("--mpy-cross", default=os.environ.get("MPY_CROSS", "mpy-cross"))
+    parser.add_argument("--measure", metavar="PORT", help="serial port of the board")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    args = parser.parse_args()
+
+    if args.measure:
+        measure_boot(args.measure, args.timeout)
+    else:
+        build(args.mpy_cross)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,28 +1,54 @@
-import asyncio
+from controller.core import boot
 
-from controller.core import rtc, scheduler, state
-from controller.menu import display, keys
-from controller.menu.scenes import SceneManager
+with boot.Phase("imports"):
+    import asyncio
+
+    from controller.core import journal, motor, rtc, scheduler, state
+    from controller.menu import display, keys
+    from controller.menu.scenes import SceneManager
 
 
 async def scheduler_main():
-    scheduler.init()
+    with boot.Phase("scheduler"):
+        scheduler.init()
+
     await scheduler.run()
 
 
 async def menu_main():
-    display.init()
-    keys.init()
+    # Let the scheduler fire due events before the display is brought up
+    await asyncio.sleep(0)
 
-    manager = SceneManager()
-    await manager.poll()
+    with boot.Phase("display"):
+        display.init()
 
+    with boot.Phase("menu"):
+        keys.init()
 
-async def main():
-    rtc.init()
-    state.init()
+        manager = SceneManager()
+        manager.draw()
+
+    boot.finish()
 
-    await asyncio.gather(scheduler_main(), menu_main())
+    await asyncio.gather(manager.poll(), manager.render_loop())
+
+
+async def main():
+    with boot.Phase("hardware"):
+        rtc.init()
+        motor.init()
+
+    with boot.Phase("state"):
+        state.init()
+        journal.init()
+
+    try:
+        await asyncio.gather(
+            scheduler_main(), motor.run(), state.run(), rtc.run(), menu_main()
+        )
+    finally:
+        state.shutdown()
+        journal.flush()
 
 
 if __name__ == "__main__":
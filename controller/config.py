@@ -10,3 +10,68 @@ I2C_RTC_SCL = board.GP13
 I2C_RTC_SDA = board.GP12
 
 MENU_LOCALE = "en"
+
+# Keys are polled at the fast interval (in seconds) for a while after a press,
+# then the interval doubles on every idle poll up to the slow one
+KEYS_POLL_FAST = 0.01
+KEYS_POLL_SLOW = 0.2
+KEYS_ACTIVE_WINDOW = 2.0
+
+# Held keys repeat after the delay, at the given rate per second. The
+# acceleration curve lists (repeat count, step multiplier) pairs.
+KEYS_REPEAT_DELAY = 0.5
+KEYS_REPEAT_RATE = 10
+KEYS_REPEAT_ACCELERATION = ((10, 2), (20, 5), (40, 10))
+
+# The display is refreshed manually, at most this many times per second
+DISPLAY_MAX_FPS = 20
+
+# Intermediate values shown while a key repeats are rendered less often
+DISPLAY_REPEAT_FPS = 5
+
+# Static text of up to this many scenes is kept rasterized (1 KB each), fewer
+# when the free heap drops below the given number of bytes
+DISPLAY_LAYER_CACHE = 6
+DISPLAY_LAYER_MIN_FREE = 16 * 1024
+
+MOTOR_OPEN_PINS = (board.GP18, board.GP20)
+MOTOR_CLOSE_PINS = (board.GP21, board.GP26)
+
+# The first pin of each pair is held low and the second one is driven with PWM
+# at the speed setting, fully on at 100%, which is what relays need. DC motors
+# can start and end runs with a ramp profile (percent of the speed) spread over
+# the ramp time, e.g. (10, 25, 50, 75, 90). Without one, outputs just switch.
+MOTOR_PWM_FREQUENCY = 20_000
+MOTOR_RAMP_PROFILE = ()
+MOTOR_RAMP_TIME = 0.5
+
+# Motor runs are written to the NVM journal in batches of this many entries
+JOURNAL_BATCH = 4
+
+# Timings, counters and the heap low-water mark shown on the diagnostics page
+METRICS_ENABLED = True
+
+# Opening and closing preempt each other instead of running at the same time
+MOTOR_INTERLOCK = True
+
+# Settings are written to NVM once no edit was made for this many seconds
+STATE_FLUSH_DELAY = 5.0
+
+# The clock is resynchronized from the external RTC this often (in seconds)
+RTC_SYNC_INTERVAL = 3600
+
+# Drift is only measured over at least this many seconds, as the external RTC
+# counts whole seconds (one second in a day is 12 ppm). Measurements are
+# clamped to the given ppm and folded into a moving average.
+RTC_DRIFT_BASELINE = 24 * 3600
+RTC_DRIFT_MAX_PPM = 100
+
+# Syncs correcting the clock by more than this many seconds are treated as the
+# clock being changed, as are events overdue by more than that
+SCHEDULER_JUMP_THRESHOLD = 5
+
+# Events the clock jumped over are either all skipped ("skip"), skipped except
+# the latest one for every motor ("latest") or all fired ("all"). Overdue
+# events fire at most once per interval (in seconds).
+SCHEDULER_CATCH_UP = "skip"
+SCHEDULER_CATCH_UP_INTERVAL = 60
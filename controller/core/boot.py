@@ -0,0 +1,66 @@
+import gc
+import time
+
+# Imported first by code.py, so this is as close to boot as the firmware gets
+start_ns = time.monotonic_ns()
+end_ns = None
+
+# Finished phases as (name, duration in ms, free heap before, free heap after)
+phases = []
+
+
+def get_mem_free():
+    # Only CircuitPython reports the free heap
+    return gc.mem_free() if hasattr(gc, "mem_free") else None
+
+
+class Phase:
+    def __init__(self, name):
+        self.name = name
+        self.start_ns = None
+        self.mem_free = None
+
+    def __enter__(self):
+        self.mem_free = get_mem_free()
+        self.start_ns = time.monotonic_ns()
+        return self
+
+    def __exit__(self, *args):
+        duration_ms = (time.monotonic_ns() - self.start_ns) // 1_000_000
+        phases.append((self.name, duration_ms, self.mem_free, get_mem_free()))
+
+
+def get_total_ms():
+    return None if end_ns is None else (end_ns - start_ns) // 1_000_000
+
+
+def format_heap(mem_free):
+    return "-" if mem_free is None else f"{mem_free // 1024}k"
+
+
+def finish():
+    global end_ns
+
+    end_ns = time.monotonic_ns()
+    print(f"Boot to first frame: {get_total_ms()} ms")
+
+    for name, duration_ms, mem_before, mem_after in phases:
+        print(
+            f"  {name:10} {duration_ms:6d} ms, free heap "
+            f"{format_heap(mem_before)} -> {format_heap(mem_after)}"
+        )
+
+
+def get_report():
+    # Fits the display: a summary line, then one line per phase
+    lines = [f"Boot {get_total_ms()} ms"]
+
+    for name, duration_ms, mem_before, mem_after in phases:
+        if mem_before is None or mem_after is None:
+            heap = ""
+        else:
+            heap = f"{(mem_after - mem_before) // 1024:+d}k"
+
+        lines.append(f"{name:9}{duration_ms:5d}ms{heap:>5}")
+
+    return lines
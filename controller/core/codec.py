@@ -0,0 +1,52 @@
+import struct
+
+from controller import constants
+
+FORMAT_VERSION = 2
+
+MOTOR_IDS = (constants.MOTOR_OPEN_ID, constants.MOTOR_CLOSE_ID)
+
+# New fields must be appended, since the position in the schema is stored
+FIELDS = (
+    (constants.DURATION_KEY, constants.DURATION_MIN, constants.DURATION_MAX),
+    (constants.SPEED_KEY, constants.SPEED_MIN, constants.SPEED_MAX),
+    (constants.HOUR_KEY, constants.HOUR_MIN, constants.HOUR_MAX),
+    (constants.MINUTE_KEY, constants.MINUTE_MIN, constants.MINUTE_MAX),
+    (constants.COUNT_KEY, constants.COUNT_MIN, constants.COUNT_MAX),
+    (constants.RATE_KEY, constants.RATE_MIN, constants.RATE_MAX),
+)
+
+SCHEMA = tuple(
+    (motor_id, key, min_value, max_value)
+    for motor_id in MOTOR_IDS
+    for key, min_value, max_value in FIELDS
+)
+
+# Field index, sequence number, value
+RECORD_FORMAT = ">BHH"
+RECORD_SIZE = struct.calcsize(RECORD_FORMAT)
+
+_indexes = {(motor_id, key): idx for idx, (motor_id, key, _, _) in enumerate(SCHEMA)}
+
+
+def pack_into(buffer, offset, sequence, motor_id, key, value):
+    if (idx := _indexes.get((motor_id, key))) is None:
+        raise ValueError(f"unknown field '{motor_id}.{key}'")
+
+    _, _, min_value, max_value = SCHEMA[idx]
+    if not min_value <= value <= max_value:
+        raise ValueError(f"value {value} out of range for '{motor_id}.{key}'")
+
+    struct.pack_into(RECORD_FORMAT, buffer, offset, idx, sequence, value)
+
+
+def unpack_from(buffer, offset):
+    idx, sequence, value = struct.unpack_from(RECORD_FORMAT, buffer, offset)
+    if idx >= len(SCHEMA):
+        raise ValueError(f"unknown field index {idx}")
+
+    motor_id, key, min_value, max_value = SCHEMA[idx]
+    if not min_value <= value <= max_value:
+        raise ValueError(f"value {value} out of range for '{motor_id}.{key}'")
+
+    return sequence, motor_id, key, value
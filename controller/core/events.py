@@ -0,0 +1,116 @@
+from array import array
+
+from controller.core import heap
+
+FLAG_ONESHOT = 1
+
+
+def make_column(typecode, capacity):
+    return array(typecode, (0 for _ in range(capacity)))
+
+
+class EventTable:
+    # Events are stored in preallocated columns indexed by slot, so the table
+    # does not allocate per event. Timestamps are kept relative to base, which
+    # keeps them small enough to avoid long integers on the heap.
+
+    def __init__(self, motor_ids, capacity):
+        self.motor_ids = motor_ids
+        self.capacity = capacity
+        self.base = 0
+
+        self.timestamps = make_column("l", capacity)
+        self.motors = make_column("B", capacity)
+        self.durations = make_column("H", capacity)
+        self.speeds = make_column("B", capacity)
+        self.flags = make_column("B", capacity)
+
+        # Slots in use as a heap ordered by timestamp, and unused slots
+        self.order = []
+        self.free = list(range(capacity - 1, -1, -1))
+
+        self._key = lambda slot: self.timestamps[slot]
+
+    def __len__(self):
+        return len(self.order)
+
+    def __iter__(self):
+        return iter(self.order)
+
+    def clear(self, base=0):
+        self.free.extend(self.order)
+        self.order.clear()
+        self.base = base
+
+    def add(self, motor_id, timestamp, duration, speed, oneshot=False):
+        if not self.free:
+            raise ValueError("event table is full")
+
+        slot = self.free.pop()
+
+        self.timestamps[slot] = timestamp - self.base
+        self.motors[slot] = self.motor_ids.index(motor_id)
+        self.durations[slot] = duration
+        self.speeds[slot] = speed
+        self.flags[slot] = FLAG_ONESHOT if oneshot else 0
+
+        heap.push(self.order, slot, self._key)
+        return slot
+
+    def remove(self, slot):
+        self.order.remove(slot)
+        self.free.append(slot)
+
+        heap.heapify(self.order, self._key)
+
+    def remove_motor(self, motor_id, oneshot):
+        kept = []
+
+        for slot in self.order:
+            if self.matches(slot, motor_id, oneshot):
+                self.free.append(slot)
+            else:
+                kept.append(slot)
+
+        self.order[:] = kept
+        heap.heapify(self.order, self._key)
+
+    def find(self, motor_id, oneshot):
+        for slot in self.order:
+            if self.matches(slot, motor_id, oneshot):
+                return slot
+
+        return None
+
+    def peek(self):
+        return self.order[0] if self.order else None
+
+    def pop(self):
+        # The slot stays allocated until it is rescheduled or released
+        return heap.pop(self.order, self._key)
+
+    def set_timestamp(self, slot, timestamp):
+        # Only for slots in the heap, which has to be reordered afterwards
+        self.timestamps[slot] = timestamp - self.base
+
+    def reorder(self):
+        heap.heapify(self.order, self._key)
+
+    def reschedule(self, slot, timestamp):
+        self.timestamps[slot] = timestamp - self.base
+        heap.push(self.order, slot, self._key)
+
+    def release(self, slot):
+        self.free.append(slot)
+
+    def get_timestamp(self, slot):
+        return self.base + self.timestamps[slot]
+
+    def get_motor_id(self, slot):
+        return self.motor_ids[self.motors[slot]]
+
+    def is_oneshot(self, slot):
+        return bool(self.flags[slot] & FLAG_ONESHOT)
+
+    def matches(self, slot, motor_id, oneshot):
+        return self.get_motor_id(slot) == motor_id and self.is_oneshot(slot) == oneshot
@@ -0,0 +1,60 @@
+def push(heap, item, key):
+    heap.append(item)
+    _sift_up(heap, len(heap) - 1, key)
+
+
+def pop(heap, key):
+    last = heap.pop()
+    if not heap:
+        return last
+
+    item = heap[0]
+    heap[0] = last
+    _sift_down(heap, 0, key)
+
+    return item
+
+
+def heapify(heap, key):
+    for idx in range(len(heap) // 2 - 1, -1, -1):
+        _sift_down(heap, idx, key)
+
+
+def _sift_up(heap, idx, key):
+    item = heap[idx]
+    item_key = key(item)
+
+    while idx > 0:
+        parent_idx = (idx - 1) // 2
+        parent = heap[parent_idx]
+
+        if not item_key < key(parent):
+            break
+
+        heap[idx] = parent
+        idx = parent_idx
+
+    heap[idx] = item
+
+
+def _sift_down(heap, idx, key):
+    size = len(heap)
+    item = heap[idx]
+    item_key = key(item)
+
+    while True:
+        child_idx = 2 * idx + 1
+        if child_idx >= size:
+            break
+
+        right_idx = child_idx + 1
+        if right_idx < size and key(heap[right_idx]) < key(heap[child_idx]):
+            child_idx = right_idx
+
+        if not key(heap[child_idx]) < item_key:
+            break
+
+        heap[idx] = heap[child_idx]
+        idx = child_idx
+
+    heap[idx] = item
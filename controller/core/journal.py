@@ -0,0 +1,182 @@
+import struct
+import time
+
+import asyncio
+
+from controller import config, constants
+from controller.core import metrics, nvm
+
+# Every completed or stopped motor run is recorded in a ring of entries at the
+# end of NVM. Entries are written in batches to bound flash wear, the newest
+# one is found by its sequence number.
+
+MOTOR_IDS = (constants.MOTOR_OPEN_ID, constants.MOTOR_CLOSE_ID)
+
+FLAG_ONESHOT = 1
+FLAG_STOPPED = 2
+
+# Sequence, motor index, flags, scheduled timestamp, start timestamp, on-time,
+# followed by a CRC
+ENTRY_FORMAT = ">HBBIII"
+ENTRY_SIZE = nvm.JOURNAL_ENTRY_SIZE
+
+SEQUENCE_MASK = 0xFFFF
+
+pending = []
+
+# Set once a batch is complete, the motor task writes it when no channel runs
+ready = asyncio.Event()
+
+# Entries already written to NVM, newest first
+stored = []
+
+_next_idx = 0
+_next_sequence = 0
+
+
+def init():
+    global _next_idx, _next_sequence
+
+    if not nvm.has_journal():
+        nvm.format_journal()
+
+    buffer = nvm.read_journal()
+    sequences = read_sequences(buffer)
+    newest = None
+
+    for idx, sequence in enumerate(sequences):
+        following = sequences[(idx + 1) % len(sequences)]
+
+        if sequence is not None and following != (sequence + 1) & SEQUENCE_MASK:
+            newest = idx
+            break
+
+    if newest is not None:
+        _next_idx = (newest + 1) % nvm.JOURNAL_ENTRIES
+        _next_sequence = (sequences[newest] + 1) & SEQUENCE_MASK
+
+    stored.clear()
+
+    for step in range(1, nvm.JOURNAL_ENTRIES + 1):
+        idx = (_next_idx - step) % nvm.JOURNAL_ENTRIES
+        if sequences[idx] is None:
+            break
+
+        values = struct.unpack_from(ENTRY_FORMAT, buffer, idx * ENTRY_SIZE)
+        stored.append(values[1:])
+
+    print(f"Journal holds {len(stored)} entries")
+
+
+def read_sequences(buffer):
+    sequences = []
+
+    for idx in range(nvm.JOURNAL_ENTRIES):
+        offset = idx * ENTRY_SIZE
+        crc_offset = offset + ENTRY_SIZE - nvm.CRC_SIZE
+
+        (crc,) = struct.unpack_from(nvm.CRC_FORMAT, buffer, crc_offset)
+        if crc != nvm.crc16(memoryview(buffer)[offset:crc_offset]):
+            sequences.append(None)
+            continue
+
+        (sequence,) = struct.unpack_from(">H", buffer, offset)
+        sequences.append(sequence)
+
+    return sequences
+
+
+def record(motor_id, scheduled, start, on_ms, oneshot, stopped):
+    flags = (FLAG_ONESHOT if oneshot else 0) | (FLAG_STOPPED if stopped else 0)
+    pending.append((MOTOR_IDS.index(motor_id), flags, scheduled, start, on_ms))
+
+    if len(pending) >= config.JOURNAL_BATCH:
+        ready.set()
+
+
+def flush():
+    global _next_idx, _next_sequence
+
+    if not pending:
+        return
+
+    print(f"Writing {len(pending)} entries to the journal")
+    start_ns = metrics.start()
+
+    buffer = bytearray(len(pending) * ENTRY_SIZE)
+    offset = 0
+
+    for motor_idx, flags, scheduled, start, on_ms in pending:
+        struct.pack_into(
+            ENTRY_FORMAT,
+            buffer,
+            offset,
+            _next_sequence,
+            motor_idx,
+            flags,
+            scheduled,
+            start,
+            on_ms,
+        )
+
+        crc_offset = offset + ENTRY_SIZE - nvm.CRC_SIZE
+        crc = nvm.crc16(memoryview(buffer)[offset:crc_offset])
+        struct.pack_into(nvm.CRC_FORMAT, buffer, crc_offset, crc)
+
+        offset += ENTRY_SIZE
+        _next_sequence = (_next_sequence + 1) & SEQUENCE_MASK
+
+    # The batch is written as one slice, split in two only where the ring wraps
+    head = min(len(pending), nvm.JOURNAL_ENTRIES - _next_idx) * ENTRY_SIZE
+    nvm.write_journal_entries(_next_idx, buffer[:head])
+    if head < len(buffer):
+        nvm.write_journal_entries(0, buffer[head:])
+
+    _next_idx = (_next_idx + len(pending)) % nvm.JOURNAL_ENTRIES
+
+    metrics.stop("journal", start_ns)
+
+    stored[:0] = reversed(pending)
+    del stored[nvm.JOURNAL_ENTRIES :]
+    pending.clear()
+
+
+def get_entries():
+    # Newest first, as (motor ID, scheduled, start, on-time in ms, flags)
+    entries = []
+
+    for source in (reversed(pending), stored):
+        for motor_idx, flags, scheduled, start, on_ms in source:
+            entries.append((MOTOR_IDS[motor_idx], scheduled, start, on_ms, flags))
+
+    return entries[: nvm.JOURNAL_ENTRIES]
+
+
+def get_report():
+    # One entry per line in 21 columns: motor, scheduled time, start delay in
+    # seconds, on-time in seconds, one-shot and stopped early marks
+    lines = []
+
+    for motor_id, scheduled, start, on_ms, flags in get_entries():
+        scheduled_time = time.localtime(scheduled)
+        oneshot = "*" if flags & FLAG_ONESHOT else " "
+        stopped = "!" if flags & FLAG_STOPPED else " "
+
+        lines.append(
+            f"{motor_id} {scheduled_time.tm_hour:02d}:{scheduled_time.tm_min:02d}"
+            f"{start - scheduled:+6d}{on_ms // 1000:6d}{oneshot}{stopped}"
+        )
+
+    return lines
+
+
+def dump():
+    print("motor,scheduled,start,delay_s,on_time_ms,oneshot,stopped")
+
+    for motor_id, scheduled, start, on_ms, flags in get_entries():
+        oneshot = int(bool(flags & FLAG_ONESHOT))
+        stopped = int(bool(flags & FLAG_STOPPED))
+        print(
+            f"{motor_id},{scheduled},{start},{start - scheduled},{on_ms},"
+            f"{oneshot},{stopped}"
+        )
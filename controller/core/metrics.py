@@ -0,0 +1,106 @@
+import gc
+import time
+
+from controller import config
+from controller.core import boot
+
+# Counters, timers and the free heap low-water mark of the running firmware.
+# Instrumented code calls start() and stop() around the measured section, or
+# stop() with a deadline to measure lateness. When disabled both return right
+# away and nothing is allocated.
+
+enabled = config.METRICS_ENABLED
+
+# Names mapped to how many times something happened
+counters = {}
+
+# Names mapped to [count, min, max, moving average] durations in microseconds
+timers = {}
+
+# Lowest free heap seen at the end of a timed section, and the section name
+heap = {
+    "low": None,
+    "name": None,
+}
+
+EWMA_SHIFT = 3
+
+# Only CircuitPython reports the free heap, looked up once instead of per sample
+_mem_free = getattr(gc, "mem_free", None)
+
+
+def reset():
+    counters.clear()
+    timers.clear()
+    heap["low"] = None
+    heap["name"] = None
+
+
+def count(name):
+    if enabled:
+        counters[name] = counters.get(name, 0) + 1
+
+
+def start():
+    return time.monotonic_ns() if enabled else 0
+
+
+def stop(name, start_ns):
+    if not (enabled and start_ns):
+        return
+
+    elapsed_us = (time.monotonic_ns() - start_ns) // 1000
+
+    if (timer := timers.get(name)) is None:
+        timers[name] = [1, elapsed_us, elapsed_us, elapsed_us]
+    else:
+        timer[0] += 1
+        timer[1] = min(timer[1], elapsed_us)
+        timer[2] = max(timer[2], elapsed_us)
+        timer[3] += (elapsed_us - timer[3]) >> EWMA_SHIFT
+
+    sample_heap(name)
+
+
+def sample_heap(name):
+    if _mem_free is None:
+        return
+
+    mem_free = _mem_free()
+    if heap["low"] is None or mem_free < heap["low"]:
+        heap["low"] = mem_free
+        heap["name"] = name
+
+
+def format_ms(us):
+    return f"{us / 1000:.1f}"
+
+
+def get_report():
+    # Timers in ms as name, moving average and maximum, then counters and the
+    # heap low-water mark, in 21 columns
+    lines = []
+
+    for name, (_, _, max_us, ewma_us) in sorted(timers.items()):
+        label = name.replace("Scene", "")[:9]
+        lines.append(f"{label:9}{format_ms(ewma_us):>6}{format_ms(max_us):>6}")
+
+    for name, value in sorted(counters.items()):
+        lines.append(f"{name[:13]:13}{value:8d}")
+
+    if heap["low"] is not None:
+        lines.append(f"heap {boot.format_heap(heap['low']):>5} {heap['name'][:10]}")
+
+    return lines
+
+
+def dump():
+    print("name,count,min_us,max_us,ewma_us")
+
+    for name, (samples, min_us, max_us, ewma_us) in sorted(timers.items()):
+        print(f"{name},{samples},{min_us},{max_us},{ewma_us}")
+
+    for name, value in sorted(counters.items()):
+        print(f"{name},{value},,,")
+
+    print(f"Lowest free heap: {boot.format_heap(heap['low'])} in {heap['name']}")
@@ -0,0 +1,274 @@
+import time
+
+from digitalio import DigitalInOut, Direction
+from pwmio import PWMOut
+
+import asyncio
+
+from controller import config, constants
+from controller.core import journal, metrics, rtc
+
+
+class Command:
+    def __init__(self, *, motor_id, timestamp, duration, speed, oneshot=False):
+        self.motor_id = motor_id
+        self.timestamp = timestamp
+        self.duration = duration
+        self.speed = speed
+        self.oneshot = oneshot
+
+
+class Driver:
+    def __init__(self, en1_pin, en2_pin):
+        self.en1 = DigitalInOut(en1_pin)
+        self.en1.direction = Direction.OUTPUT
+        self.en1.value = False
+
+        self.en2 = PWMOut(en2_pin, duty_cycle=0, frequency=config.MOTOR_PWM_FREQUENCY)
+
+    def set_speed(self, speed):
+        self.en2.duty_cycle = speed * 0xFFFF // constants.SPEED_MAX
+
+
+class Channel:
+    def __init__(self, motor_id, name, en1_pin, en2_pin):
+        self.motor_id = motor_id
+        self.name = name
+        self.en1_pin = en1_pin
+        self.en2_pin = en2_pin
+
+        self.driver = None
+
+        self.queue = []
+        self.active = None
+        self.deadline_ns = None
+
+        self.ready = asyncio.Event()
+        self.stop = asyncio.Event()
+        self.idle = asyncio.Event()
+        self.idle.set()
+
+    def submit(self, command):
+        for queued_command in self.queue:
+            if is_duplicate(queued_command, command):
+                print(f"Coalescing duplicate command for ID '{self.motor_id}'")
+                return
+
+        self.queue.append(command)
+        self.ready.set()
+
+    def cancel(self):
+        if self.queue:
+            count = len(self.queue)
+            print(f"Dropping {count} queued commands for ID '{self.motor_id}'")
+            self.queue.clear()
+
+        if self.active is not None:
+            print(f"Stopping in-flight command for ID '{self.motor_id}'")
+            self.stop.set()
+
+    async def run(self):
+        while True:
+            while not self.queue:
+                self.ready.clear()
+                await self.ready.wait()
+
+            if config.MOTOR_INTERLOCK:
+                await get_opposite_channel(self.motor_id).idle.wait()
+
+            if not self.queue:
+                continue
+
+            command = self.queue.pop(0)
+
+            self.active = command
+            self.stop.clear()
+            self.idle.clear()
+
+            print(self.name)
+            await control_motor(self, command)
+
+            self.active = None
+            self.idle.set()
+
+
+channels = {
+    constants.MOTOR_OPEN_ID: Channel(
+        constants.MOTOR_OPEN_ID, "Opening", *config.MOTOR_OPEN_PINS
+    ),
+    constants.MOTOR_CLOSE_ID: Channel(
+        constants.MOTOR_CLOSE_ID, "Closing", *config.MOTOR_CLOSE_PINS
+    ),
+}
+
+
+# Difference between the measured enable pin on-time and the requested duration
+# of commands that ran to completion, in ms
+timing = {
+    "count": 0,
+    "last": 0,
+    "max": 0,
+    "total": 0,
+}
+
+
+def is_duplicate(command, other):
+    return command.duration == other.duration and command.speed == other.speed
+
+
+def get_opposite_channel(motor_id):
+    if motor_id == constants.MOTOR_OPEN_ID:
+        return channels[constants.MOTOR_CLOSE_ID]
+
+    return channels[constants.MOTOR_OPEN_ID]
+
+
+def submit(command):
+    if (channel := channels.get(command.motor_id)) is None:
+        print(f"Warning: unknown motor ID '{command.motor_id}'")
+        return
+
+    if config.MOTOR_INTERLOCK:
+        get_opposite_channel(command.motor_id).cancel()
+
+    channel.submit(command)
+
+
+def cancel(motor_id):
+    if (channel := channels.get(motor_id)) is not None:
+        channel.cancel()
+
+
+def get_deadlines_ns():
+    # When active channels are due to stop, on the time.monotonic_ns() scale
+    return [
+        channel.deadline_ns
+        for channel in channels.values()
+        if channel.deadline_ns is not None
+    ]
+
+
+def record_timing(channel, command, on_ns):
+    error = on_ns // 1_000_000 - command.duration * 1000
+
+    timing["count"] += 1
+    timing["last"] = error
+    timing["max"] = max(timing["max"], abs(error))
+    timing["total"] += error
+
+    print(f"Motor ID '{channel.motor_id}' was on {error} ms longer than requested")
+
+
+def is_active():
+    return any(channel.active is not None for channel in channels.values())
+
+
+async def wait_for_idle():
+    while is_active():
+        for channel in channels.values():
+            await channel.idle.wait()
+
+
+def init():
+    # Pins stay configured from boot, so a run starts without any setup
+    for channel in channels.values():
+        channel.driver = Driver(channel.en1_pin, channel.en2_pin)
+
+
+async def write_journal():
+    while True:
+        await journal.ready.wait()
+
+        # Flash writes stall the core, so they wait until no channel runs
+        await wait_for_idle()
+        journal.ready.clear()
+
+        # A failed write keeps the entries pending until the next batch
+        try:
+            journal.flush()
+        except Exception as e:
+            print(f"Could not write the journal because of {e.__class__.__name__}")
+
+
+async def run():
+    channel_tasks = (channel.run() for channel in channels.values())
+    await asyncio.gather(*channel_tasks, write_journal())
+
+
+async def wait_for_stop(channel, timeout):
+    try:
+        await asyncio.wait_for(channel.stop.wait(), timeout)
+        return True
+    except asyncio.TimeoutError:
+        return False
+
+
+def get_remaining(deadline_ns):
+    return max(deadline_ns - time.monotonic_ns(), 0) / 1_000_000_000
+
+
+async def control_motor(channel, command):
+    driver = channel.driver
+    profile = config.MOTOR_RAMP_PROFILE
+
+    # Ramps take part of the requested duration, at most half of it each
+    ramp_time = min(config.MOTOR_RAMP_TIME, command.duration / 2)
+    step_ns = int(ramp_time * 1_000_000_000) // len(profile) if profile else 0
+
+    # Every step waits for an absolute time, so a late wakeup is not carried
+    # over into the following steps
+    start_ns = time.monotonic_ns()
+    start_timestamp = rtc.get_timestamp() or time.time()
+    next_ns = start_ns
+
+    channel.deadline_ns = start_ns + command.duration * 1_000_000_000
+
+    stopped = False
+    reached = 0
+
+    for level in profile:
+        driver.set_speed(command.speed * level // 100)
+        reached += 1
+        next_ns += step_ns
+
+        if await wait_for_stop(channel, get_remaining(next_ns)):
+            stopped = True
+            break
+
+        metrics.stop("ramp", next_ns)
+
+    if not stopped:
+        driver.set_speed(command.speed)
+
+        next_ns = channel.deadline_ns - reached * step_ns
+        stopped = await wait_for_stop(channel, get_remaining(next_ns))
+
+    if stopped:
+        print(f"Command for ID '{channel.motor_id}' was stopped early")
+        metrics.count("stopped")
+        next_ns = time.monotonic_ns()
+
+    # Ramps down from the level reached, also after being stopped early
+    for level in reversed(profile[:reached]):
+        driver.set_speed(command.speed * level // 100)
+        next_ns += step_ns
+        await asyncio.sleep(get_remaining(next_ns))
+        metrics.stop("ramp", next_ns)
+
+    driver.set_speed(0)
+
+    on_ns = time.monotonic_ns() - start_ns
+    channel.deadline_ns = None
+    metrics.count("runs")
+
+    if not stopped:
+        record_timing(channel, command, on_ns)
+
+    journal.record(
+        command.motor_id,
+        command.timestamp,
+        start_timestamp,
+        on_ns // 1_000_000,
+        command.oneshot,
+        stopped,
+    )
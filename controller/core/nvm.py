@@ -1,39 +1,294 @@
 import json
+import struct
+from array import array
 
 from microcontroller import nvm
 
-HEADER_SIZE = 2
-HEADER_SIZE_BITS = 16
+from controller.core import codec
 
+# NVM is split into two banks. The active bank holds an append-only log of
+# records, each one storing a single setting. When the active bank is full,
+# the latest values are compacted into the other bank, whose header is written
+# last, so a reset between the two writes leaves the old bank in charge. The
+# end of NVM holds the actuation journal, each bank is shortened by its size.
+#
+# All of NVM is one flash sector. Appending into erased bytes only programs
+# them, any other write erases and reprograms the whole sector, so a power cut
+# during a compaction can lose both banks and the journal.
 
-def read_data_length():
-    hi, lo = nvm[0:HEADER_SIZE]
-    return hi * (1 << 8) + lo
+CRC_FORMAT = ">H"
+CRC_SIZE = struct.calcsize(CRC_FORMAT)
 
+BANK_COUNT = 2
+BANK_STRIDE = len(nvm) // BANK_COUNT
 
-def make_data_length(length):
-    assert 0 <= length < (1 << HEADER_SIZE_BITS)
+JOURNAL_MAGIC = b"DJ"
+JOURNAL_VERSION = 1
+JOURNAL_HEADER_FORMAT = ">2sB"
+JOURNAL_HEADER_SIZE = struct.calcsize(JOURNAL_HEADER_FORMAT)
+JOURNAL_ENTRY_SIZE = 16 + CRC_SIZE
+JOURNAL_ENTRIES = 32
+JOURNAL_SIZE = JOURNAL_HEADER_SIZE + JOURNAL_ENTRIES * JOURNAL_ENTRY_SIZE
+JOURNAL_START = len(nvm) - JOURNAL_SIZE
 
-    hi, lo = divmod(length, (1 << 8))
-    return bytes((hi, lo))
+BANK_SIZE = BANK_STRIDE - JOURNAL_SIZE
+
+BANK_MAGIC = b"DC"
+BANK_HEADER_FORMAT = ">2sBIH"
+BANK_HEADER_SIZE = struct.calcsize(BANK_HEADER_FORMAT)
+
+RECORD_SIZE = codec.RECORD_SIZE + CRC_SIZE
+
+ERASED = 0xFF
+SEQUENCE_MASK = 0xFFFF
+
+# Settings blob written by v0.3, only read to migrate the settings
+LEGACY_HEADER_SIZE = 2
+
+_stored = {}
+
+_bank = None
+_generation = 0
+_offset = 0
+_sequence = 0
+
+
+def make_crc_table():
+    table = array("H", bytes(2 * 256))
+
+    for idx in range(256):
+        crc = idx << 8
+
+        for _ in range(8):
+            if crc & 0x8000:
+                crc = ((crc << 1) ^ 0x1021) & 0xFFFF
+            else:
+                crc = (crc << 1) & 0xFFFF
+
+        table[idx] = crc
+
+    return table
+
+
+_crc_table = make_crc_table()
+
+
+def crc16(data, crc=0xFFFF):
+    for byte in data:
+        crc = ((crc << 8) & 0xFFFF) ^ _crc_table[(crc >> 8) ^ byte]
+
+    return crc
+
+
+def next_sequence(sequence):
+    return (sequence + 1) & SEQUENCE_MASK
+
+
+def get_bank_start(bank):
+    return bank * BANK_STRIDE
+
+
+def read_bank_header(bank):
+    start = get_bank_start(bank)
+    header = nvm[start : start + BANK_HEADER_SIZE]
+
+    magic, version, generation, crc = struct.unpack(BANK_HEADER_FORMAT, header)
+    if magic != BANK_MAGIC or crc != crc16(header[:-CRC_SIZE]):
+        return None
+    if version != codec.FORMAT_VERSION:
+        return None
+
+    return generation
+
+
+def make_bank_header(generation):
+    header = struct.pack(
+        BANK_HEADER_FORMAT, BANK_MAGIC, codec.FORMAT_VERSION, generation, 0
+    )
+    crc = crc16(header[:-CRC_SIZE])
+
+    return header[:-CRC_SIZE] + struct.pack(CRC_FORMAT, crc)
+
+
+def make_record(buffer, offset, sequence, motor_id, key, value):
+    codec.pack_into(buffer, offset, sequence, motor_id, key, value)
+
+    crc = crc16(memoryview(buffer)[offset : offset + codec.RECORD_SIZE])
+    struct.pack_into(CRC_FORMAT, buffer, offset + codec.RECORD_SIZE, crc)
+
+
+def read_record(buffer, offset, sequence):
+    crc_offset = offset + codec.RECORD_SIZE
+
+    (crc,) = struct.unpack_from(CRC_FORMAT, buffer, crc_offset)
+    if crc != crc16(memoryview(buffer)[offset:crc_offset]):
+        raise ValueError("CRC mismatch")
+
+    record = codec.unpack_from(buffer, offset)
+    if sequence is not None and record[0] != next_sequence(sequence):
+        raise ValueError("sequence gap")
+
+    return record
+
+
+def replay_bank(bank, data):
+    # The bank is read once and records are decoded in place from that buffer
+    start = get_bank_start(bank)
+    buffer = nvm[start : start + BANK_SIZE]
+
+    offset = BANK_HEADER_SIZE
+    sequence = None
+
+    while offset + RECORD_SIZE <= BANK_SIZE and buffer[offset] != ERASED:
+        try:
+            sequence, motor_id, key, value = read_record(buffer, offset, sequence)
+        except ValueError as e:
+            print(f"Stopping at NVM offset {start + offset} because of {e}")
+            return start + offset, sequence, False
+
+        data.setdefault(motor_id, {})[key] = value
+        offset += RECORD_SIZE
+
+    return start + offset, sequence, True
+
+
+def read_legacy():
+    hi, lo = nvm[0:LEGACY_HEADER_SIZE]
+    raw_length = hi * (1 << 8) + lo
+
+    print(f"Reading {raw_length} bytes of legacy data from NVM")
+    raw_bytes = nvm[LEGACY_HEADER_SIZE : raw_length + LEGACY_HEADER_SIZE]
+
+    return json.loads(raw_bytes.decode())
+
+
+def has_journal():
+    header = nvm[JOURNAL_START : JOURNAL_START + JOURNAL_HEADER_SIZE]
+    return struct.unpack(JOURNAL_HEADER_FORMAT, header) == (
+        JOURNAL_MAGIC,
+        JOURNAL_VERSION,
+    )
+
+
+def format_journal():
+    region = bytearray(bytes((ERASED,)) * JOURNAL_SIZE)
+    struct.pack_into(JOURNAL_HEADER_FORMAT, region, 0, JOURNAL_MAGIC, JOURNAL_VERSION)
+
+    print(f"Formatting {JOURNAL_SIZE} bytes of NVM for the journal")
+    nvm[JOURNAL_START : JOURNAL_START + JOURNAL_SIZE] = region
+
+
+def read_journal():
+    start = JOURNAL_START + JOURNAL_HEADER_SIZE
+    return nvm[start : start + JOURNAL_ENTRIES * JOURNAL_ENTRY_SIZE]
+
+
+def write_journal_entries(idx, entries):
+    # Every write rewrites the whole flash sector, so a batch of consecutive
+    # entries is written in one go
+    start = JOURNAL_START + JOURNAL_HEADER_SIZE + idx * JOURNAL_ENTRY_SIZE
+    nvm[start : start + len(entries)] = entries
 
 
 def read_nvm():
-    raw_length = read_data_length()
+    global _bank, _generation, _offset, _sequence
+
+    banks = []
+    for bank in range(BANK_COUNT):
+        if (generation := read_bank_header(bank)) is not None:
+            banks.append((generation, bank))
+
+    if not banks:
+        data = read_legacy()
+        compact(data)
+        return data
+
+    generation, bank = max(banks)
+    data = {}
+
+    _bank = bank
+    _generation = generation
 
-    print(f"Reading {raw_length} bytes of data from NVM")
-    raw_bytes = nvm[HEADER_SIZE : raw_length + HEADER_SIZE]
-    raw_str = raw_bytes.decode()
+    offset, sequence, clean = replay_bank(bank, data)
 
-    data = json.loads(raw_str)
+    length = offset - get_bank_start(bank)
+    print(f"Reading {length} bytes of data from NVM bank {bank}")
+
+    _offset = offset
+    _sequence = 0 if sequence is None else next_sequence(sequence)
+    store(data)
+
+    if not clean:
+        compact(data)
 
     return data
 
 
 def write_nvm(data):
-    raw_str = json.dumps(data, separators=(",", ":"))
-    raw_bytes = raw_str.encode()
-    raw_length = len(raw_bytes)
+    if _bank is None:
+        compact(data)
+        return
+
+    for motor_id, values in data.items():
+        for key, value in values.items():
+            if _stored.get(motor_id, {}).get(key) != value:
+                append_record(data, motor_id, key, value)
+
+
+def append_record(data, motor_id, key, value):
+    global _offset, _sequence
+
+    if _offset + RECORD_SIZE > get_bank_start(_bank) + BANK_SIZE:
+        compact(data)
+        return
+
+    record = bytearray(RECORD_SIZE)
+    make_record(record, 0, _sequence, motor_id, key, value)
+
+    print(f"Writing {RECORD_SIZE} bytes of data to NVM")
+    nvm[_offset : _offset + RECORD_SIZE] = record
+
+    _offset += RECORD_SIZE
+    _sequence = next_sequence(_sequence)
+    _stored.setdefault(motor_id, {})[key] = value
+
+
+def compact(data):
+    global _bank, _generation, _offset, _sequence
+
+    # The first compaction goes into bank 1, so the v0.3 settings at the start
+    # of bank 0 stay readable until the new bank header is written
+    bank = 1 if _bank is None else (_bank + 1) % BANK_COUNT
+    start = get_bank_start(bank)
+
+    buffer = bytearray(bytes((ERASED,)) * BANK_SIZE)
+    offset = BANK_HEADER_SIZE
+    sequence = _sequence
+
+    for motor_id, values in data.items():
+        for key, value in values.items():
+            try:
+                make_record(buffer, offset, sequence, motor_id, key, value)
+            except ValueError as e:
+                print(f"Skipping setting because of {e}")
+                continue
+
+            offset += RECORD_SIZE
+            sequence = next_sequence(sequence)
+
+    print(f"Compacting {offset} bytes of data into NVM bank {bank}")
+    nvm[start : start + BANK_SIZE] = buffer
+    nvm[start : start + BANK_HEADER_SIZE] = make_bank_header(_generation + 1)
+
+    _bank = bank
+    _generation += 1
+    _offset = start + offset
+    _sequence = sequence
+    store(data)
+
+
+def store(data):
+    _stored.clear()
 
-    print(f"Writing {raw_length} bytes of data to NVM")
-    nvm[0 : raw_length + HEADER_SIZE] = make_data_length(raw_length) + raw_bytes
+    for motor_id, values in data.items():
+        _stored[motor_id] = dict(values)
@@ -1,3 +1,6 @@
+import time
+
+import asyncio
 from busio import I2C
 from rtc import RTC
 
@@ -5,36 +8,177 @@ from adafruit_ds3231 import DS3231
 
 from controller import config
 
-i2c = I2C(config.I2C_RTC_SCL, config.I2C_RTC_SDA)
+SECONDS_IN_A_DAY = 60 * 60 * 24
+
+DRIFT_EWMA_SHIFT = 2
 
 rtc_internal = RTC()
-rtc_external = DS3231(i2c)
 
-# Store external RTC state in case it gets disconnected
-_lost_power = rtc_external.lost_power
+# The external RTC is brought up on first use, until then the time is unknown
+_rtc_external = None
+_lost_power = True
+
+# Wall clock time is kept as an epoch timestamp at a monotonic time, corrected
+# by the drift measured against the external RTC since the reference point
+_anchor_timestamp = 0
+_anchor_ns = 0
+_reference_timestamp = None
+_reference_ns = None
+_drift_ppm = 0
+
+# How often the clock was changed, by being set or by a sync correcting it by
+# more than the jump threshold, and how many seconds it moved in total
+_changes = 0
+_changed_by = 0
+
+_cached_timestamp = None
+_cached_datetime = None
+
+
+def get_external():
+    global _rtc_external, _lost_power
+
+    if _rtc_external is None:
+        i2c = I2C(config.I2C_RTC_SCL, config.I2C_RTC_SDA)
+        _rtc_external = DS3231(i2c)
+
+        # Store external RTC state in case it gets disconnected
+        _lost_power = _rtc_external.lost_power
+
+    return _rtc_external
 
 
 def init():
+    get_external()
+
     if _lost_power:
         print("External RTC lost power")
         return
 
     print("Retrieving time from external RTC")
-    rtc_internal.datetime = rtc_external.datetime
+    sync()
 
 
-def get_datetime():
+def anchor(timestamp, now_ns):
+    global _anchor_timestamp, _anchor_ns
+
+    _anchor_timestamp = timestamp
+    _anchor_ns = now_ns
+
+    rtc_internal.datetime = time.localtime(timestamp)
+
+
+def reset_reference(timestamp, now_ns):
+    global _reference_timestamp, _reference_ns, _drift_ppm
+
+    _reference_timestamp = timestamp
+    _reference_ns = now_ns
+    _drift_ppm = 0
+
+
+def record_change(jump):
+    global _changes, _changed_by
+
+    _changes += 1
+    _changed_by += jump
+
+
+def sync():
+    global _drift_ppm
+
+    timestamp = time.mktime(get_external().datetime)
+    now_ns = time.monotonic_ns()
+
+    if _reference_ns is None:
+        reset_reference(timestamp, now_ns)
+    else:
+        error = timestamp - get_timestamp()
+
+        # The external RTC only counts whole seconds, so drift is measured over
+        # the whole time since the reference point
+        elapsed = (now_ns - _reference_ns) // 1_000_000_000
+        if elapsed >= config.RTC_DRIFT_BASELINE:
+            offset = timestamp - _reference_timestamp - elapsed
+            drift_ppm = offset * 1_000_000 // elapsed
+            drift_ppm = max(-config.RTC_DRIFT_MAX_PPM, drift_ppm)
+            drift_ppm = min(drift_ppm, config.RTC_DRIFT_MAX_PPM)
+
+            _drift_ppm += (drift_ppm - _drift_ppm) >> DRIFT_EWMA_SHIFT
+
+        print(f"Clock off by {error} s, drift is {_drift_ppm} ppm")
+
+        if abs(error) > config.SCHEDULER_JUMP_THRESHOLD:
+            record_change(error)
+
+    anchor(timestamp, now_ns)
+
+
+def is_set():
+    return not _lost_power
+
+
+def get_drift_ppm():
+    return _drift_ppm
+
+
+def get_changes():
+    return _changes, _changed_by
+
+
+def get_timestamp():
     if _lost_power:
         return None
 
-    return rtc_internal.datetime
+    elapsed_ns = time.monotonic_ns() - _anchor_ns
+    elapsed_ns += elapsed_ns * _drift_ppm // 1_000_000
+
+    return _anchor_timestamp + elapsed_ns // 1_000_000_000
+
+
+def get_minute_of_day():
+    if (timestamp := get_timestamp()) is None:
+        return None
+
+    return timestamp % SECONDS_IN_A_DAY // 60
+
+
+def get_datetime():
+    global _cached_timestamp, _cached_datetime
+
+    if (timestamp := get_timestamp()) is None:
+        return None
+
+    # Converted at most once a second
+    if timestamp != _cached_timestamp:
+        _cached_timestamp = timestamp
+        _cached_datetime = time.localtime(timestamp)
+
+    return _cached_datetime
 
 
 def set_datetime(dt):
     global _lost_power
 
-    rtc_internal.datetime = dt
-    rtc_external.datetime = dt
+    previous_timestamp = get_timestamp()
+
+    get_external().datetime = dt
     _lost_power = False
 
+    timestamp = time.mktime(dt)
+    now_ns = time.monotonic_ns()
+
+    if previous_timestamp is not None:
+        record_change(timestamp - previous_timestamp)
+
+    anchor(timestamp, now_ns)
+    reset_reference(timestamp, now_ns)
+
     print(f"Updating RTC time to {dt.tm_hour:02d}:{dt.tm_min:02d}")
+
+
+async def run():
+    while True:
+        await asyncio.sleep(config.RTC_SYNC_INTERVAL)
+
+        if not _lost_power:
+            sync()
@@ -1,26 +1,40 @@
-import board
 import time
-from digitalio import DigitalInOut, Direction
 
 import asyncio
 
-from controller import constants
-from controller.core import rtc
+from controller import config, constants
+from controller.core import events, metrics, motor, rtc, timetable
 from controller.service import control
 
-RUN_RATE = 5.0
 SECONDS_IN_A_DAY = 60 * 60 * 24
 
-data = []
+CATCH_UP_SKIP = "skip"
+CATCH_UP_LATEST = "latest"
+CATCH_UP_ALL = "all"
 
+MOTOR_IDS = (constants.MOTOR_OPEN_ID, constants.MOTOR_CLOSE_ID)
 
-class Event:
-    def __init__(self, *, motor_id, timestamp, duration, speed, oneshot=False):
-        self.motor_id = motor_id
-        self.timestamp = timestamp
-        self.duration = duration
-        self.speed = speed
-        self.oneshot = oneshot
+# Every motor has up to COUNT_MAX scheduled events and one pending one-shot
+CAPACITY = len(MOTOR_IDS) * (constants.COUNT_MAX + 1)
+
+data = events.EventTable(MOTOR_IDS, CAPACITY)
+
+wakeup = asyncio.Event()
+
+# Clock changes reported by the RTC as of the last tick, to detect clock jumps
+_clock_changes = None
+
+_last_catch_up_ns = None
+
+# When the scheduler is due to wake up, on the time.monotonic_ns() scale
+_wakeup_ns = None
+
+latency = {
+    "count": 0,
+    "last": 0,
+    "max": 0,
+    "total": 0,
+}
 
 
 def init_motor(motor_id):
@@ -34,135 +48,257 @@ def init_motor(motor_id):
     minute = control.get_minute(motor_id)
     rate = control.get_rate(motor_id)
 
-    current_time = rtc.get_datetime()
-    current_timestamp = time.mktime(current_time)
+    minutes = timetable.compile_minutes(hour, minute, count, rate)
 
-    for it in range(count):
-        offset = hour * 60 + rate * it + minute
-        hh, mm = divmod(offset, 60)
+    current_timestamp = rtc.get_timestamp()
 
-        if hh > 23:
-            continue  # FIXME
+    # Every occurrence is an offset from midnight
+    midnight = current_timestamp - current_timestamp % SECONDS_IN_A_DAY
 
+    for offset in minutes:
+        hh, mm = divmod(offset, 60)
         print(f"Creating scheduled event at {hh:02d}:{mm:02d} for ID '{motor_id}'")
 
-        schedule_time = time.struct_time(
-            (
-                current_time.tm_year,
-                current_time.tm_mon,
-                current_time.tm_mday,
-                hh,
-                mm,
-                0,
-                -1,
-                -1,
-                -1,
-            )
-        )
-
-        schedule_timestamp = time.mktime(schedule_time)
+        schedule_timestamp = midnight + offset * 60
         if current_timestamp > schedule_timestamp:
             schedule_timestamp += SECONDS_IN_A_DAY
 
-        event = Event(
-            motor_id=motor_id,
-            duration=duration,
-            speed=speed,
-            timestamp=schedule_timestamp,
-        )
-        data.append(event)
+        data.add(motor_id, schedule_timestamp, duration, speed)
 
 
 def init():
-    data.clear()
+    global _clock_changes
+
+    notify()
+    _clock_changes = None
 
-    if rtc.get_datetime() is None:
+    if (current_timestamp := rtc.get_timestamp()) is None:
+        data.clear()
         print("Clock is not set, scheduler will not be started")
         return
 
-    for motor_id in (constants.MOTOR_OPEN_ID, constants.MOTOR_CLOSE_ID):
+    data.clear(base=current_timestamp)
+
+    for motor_id in MOTOR_IDS:
         init_motor(motor_id)
 
 
+def update_motor(motor_id, key):
+    if key in (constants.DURATION_KEY, constants.SPEED_KEY):
+        patch_motor(motor_id)
+    else:
+        rebuild_motor(motor_id)
+
+
+def patch_motor(motor_id):
+    duration = control.get_duration(motor_id)
+    speed = control.get_speed(motor_id)
+
+    print(f"Updating scheduled events for ID '{motor_id}'")
+
+    for slot in data:
+        if data.matches(slot, motor_id, oneshot=False):
+            data.durations[slot] = duration
+            data.speeds[slot] = speed
+
+
+def rebuild_motor(motor_id):
+    data.remove_motor(motor_id, oneshot=False)
+
+    if rtc.is_set():
+        init_motor(motor_id)
+
+    notify()
+
+
+def notify():
+    wakeup.set()
+
+
+def clock_changed():
+    # Events are re-anchored by the next tick, unless there were none yet
+    if _clock_changes is None:
+        init()
+    else:
+        notify()
+
+
+def wrap_into_day(timestamp, current_timestamp):
+    # Moves a daily event by whole days into the 24 hours after current time
+    days = (current_timestamp - timestamp) // SECONDS_IN_A_DAY + 1
+    return timestamp + days * SECONDS_IN_A_DAY
+
+
+def get_catch_up_slots(current_timestamp):
+    if config.SCHEDULER_CATCH_UP == CATCH_UP_SKIP:
+        return ()
+
+    missed = [
+        slot
+        for slot in data
+        if not data.is_oneshot(slot) and data.get_timestamp(slot) <= current_timestamp
+    ]
+
+    if config.SCHEDULER_CATCH_UP == CATCH_UP_ALL:
+        return missed
+
+    latest = {}
+    for slot in missed:
+        motor_id = data.get_motor_id(slot)
+        previous = latest.get(motor_id)
+
+        if previous is None or data.timestamps[previous] < data.timestamps[slot]:
+            latest[motor_id] = slot
+
+    return list(latest.values())
+
+
+def reanchor(current_timestamp, jump):
+    print(f"Clock jumped by {jump} s, re-anchoring scheduled events")
+
+    catch_up = get_catch_up_slots(current_timestamp)
+
+    for slot in data:
+        timestamp = data.get_timestamp(slot)
+
+        if data.is_oneshot(slot):
+            timestamp = min(timestamp, current_timestamp)
+        elif slot not in catch_up:
+            timestamp = wrap_into_day(timestamp, current_timestamp)
+
+        data.set_timestamp(slot, timestamp)
+
+    data.reorder()
+
+
+def check_clock(current_timestamp):
+    global _clock_changes
+
+    # Drift is corrected by the RTC module, only changes it reports are jumps
+    changes = rtc.get_changes()
+
+    if _clock_changes is not None and changes[0] != _clock_changes[0]:
+        reanchor(current_timestamp, changes[1] - _clock_changes[1])
+
+    _clock_changes = changes
+
+
+def get_catch_up_delay():
+    # Seconds until an overdue event may fire, so catch-up runs are spread out
+    if _last_catch_up_ns is None:
+        return 0
+
+    interval_ns = config.SCHEDULER_CATCH_UP_INTERVAL * 1_000_000_000
+    remaining_ns = _last_catch_up_ns + interval_ns - time.monotonic_ns()
+
+    return max(remaining_ns, 0) / 1_000_000_000
+
+
+def cancel(motor_id):
+    if (slot := data.find(motor_id, oneshot=True)) is not None:
+        print(f"Cancelling pending one-time event for ID '{motor_id}'")
+        data.remove(slot)
+
+    motor.cancel(motor_id)
+
+
 def request_oneshot(motor_id):
     print(f"Creating one-time event for ID '{motor_id}'")
 
     duration = control.get_duration(motor_id)
     speed = control.get_speed(motor_id)
 
-    event = Event(
-        motor_id=motor_id,
-        duration=duration,
-        speed=speed,
-        oneshot=True,
-        timestamp=time.time(),
-    )
+    if (slot := data.find(motor_id, oneshot=True)) is not None:
+        data.remove(slot)
 
-    for idx, existing_event in enumerate(data):
-        if existing_event.oneshot and motor_id == existing_event.motor_id:
-            data[idx] = event
-            return
+    timestamp = rtc.get_timestamp() or time.time()
+    data.add(motor_id, timestamp, duration, speed, oneshot=True)
+    notify()
 
-    data.append(event)
 
+def record_latency(command, current_timestamp):
+    delay = current_timestamp - command.timestamp
 
-async def run():
-    # TODO: one-shot events should be handled even if system clock is not set
+    latency["count"] += 1
+    latency["last"] = delay
+    latency["max"] = max(latency["max"], delay)
+    latency["total"] += delay
 
-    while True:
-        if (current_time := rtc.get_datetime()) is None:
-            await asyncio.sleep(RUN_RATE)
-            continue
+    print(f"Event on motor ID '{command.motor_id}' fired {delay} s after schedule")
 
-        current_timestamp = time.mktime(current_time)
 
-        for event in list(data):
-            if event.timestamp is None or current_timestamp <= event.timestamp:
-                continue
+async def wait_for_wakeup(timeout):
+    try:
+        await asyncio.wait_for(wakeup.wait(), timeout)
+    except asyncio.TimeoutError:
+        pass
 
-            print(f"Processing event on motor ID '{event.motor_id}'")
 
-            if event.motor_id == constants.MOTOR_OPEN_ID:
-                await open_motor(event)
-            elif event.motor_id == constants.MOTOR_CLOSE_ID:
-                await close_motor(event)
-            else:
-                print(f"Warning: unknown motor ID '{event.motor_id}'")
+def tick():
+    # Fires the earliest due event and returns 0, or returns how many seconds
+    # to wait for the next one (None if there is nothing to wait for)
+    global _last_catch_up_ns
 
-            if event.oneshot:
-                print(f"New timestamp is not created for one-shot event")
-                event.timestamp = None
-            else:
-                event.timestamp += SECONDS_IN_A_DAY
-                print(f"Creating new timestamp for the event")
+    if (current_timestamp := rtc.get_timestamp()) is None:
+        return None
 
-        await asyncio.sleep(RUN_RATE)
+    check_clock(current_timestamp)
 
+    if (slot := data.peek()) is None:
+        return None
 
-async def control_motor(event, en1_pin, en2_pin):
-    en1 = DigitalInOut(en1_pin)
-    en2 = DigitalInOut(en2_pin)
+    timestamp = data.get_timestamp(slot)
+    if current_timestamp < timestamp:
+        return timestamp - current_timestamp
 
-    en1.direction = Direction.OUTPUT
-    en2.direction = Direction.OUTPUT
+    if current_timestamp - timestamp > config.SCHEDULER_JUMP_THRESHOLD:
+        if delay := get_catch_up_delay():
+            return delay
 
-    en1.value = False
-    en2.value = True
+        _last_catch_up_ns = time.monotonic_ns()
 
-    await asyncio.sleep(event.duration)
+    data.pop()
+
+    command = motor.Command(
+        motor_id=data.get_motor_id(slot),
+        timestamp=timestamp,
+        duration=data.durations[slot],
+        speed=data.speeds[slot],
+        oneshot=data.is_oneshot(slot),
+    )
+    record_latency(command, current_timestamp)
 
-    en1.value = False
-    en2.value = False
+    if command.oneshot:
+        data.release(slot)
+        print(f"New timestamp is not created for one-shot event")
+    else:
+        data.reschedule(slot, wrap_into_day(timestamp, current_timestamp))
+        print(f"Creating new timestamp for the event")
 
-    en1.deinit()
-    en2.deinit()
+    print(f"Processing event on motor ID '{command.motor_id}'")
+    motor.submit(command)
 
+    return 0
+
+
+def get_wakeup_ns():
+    return _wakeup_ns
+
+
+async def run():
+    # TODO: one-shot events should be handled even if system clock is not set
+    global _wakeup_ns
+
+    while True:
+        wakeup.clear()
 
-async def open_motor(event):
-    print("Opening")
-    await control_motor(event, board.GP18, board.GP20)
+        start_ns = metrics.start()
+        timeout = tick()
+        metrics.stop("tick", start_ns)
 
+        if timeout != 0:
+            if timeout is not None:
+                _wakeup_ns = time.monotonic_ns() + int(timeout * 1_000_000_000)
 
-async def close_motor(event):
-    print("Closing")
-    await control_motor(event, board.GP21, board.GP26)
+            await wait_for_wakeup(timeout)
+            _wakeup_ns = None
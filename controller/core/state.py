@@ -1,6 +1,13 @@
-from controller.core import nvm
+import asyncio
+
+from controller import config
+from controller.core import metrics, motor, nvm
 
 data = {}
+pending_writes = 0
+
+_changed = asyncio.Event()
+_commit = asyncio.Event()
 
 
 def init():
@@ -25,4 +32,66 @@ def load_state_safe():
 
 
 def save_state():
+    global pending_writes
+
+    pending_writes += 1
+    metrics.count("saves")
+    _changed.set()
+
+
+def commit():
+    if pending_writes:
+        _commit.set()
+
+
+def flush():
+    global pending_writes
+
+    if not pending_writes:
+        return
+
+    print(f"Flushing {pending_writes} pending settings changes")
+
+    start_ns = metrics.start()
     nvm.write_nvm(data)
+    metrics.stop("nvm", start_ns)
+
+    pending_writes = 0
+
+
+def shutdown():
+    flush()
+
+
+async def wait_for_idle():
+    while True:
+        _changed.clear()
+
+        try:
+            await asyncio.wait_for(_commit.wait(), config.STATE_FLUSH_DELAY)
+            return
+        except asyncio.TimeoutError:
+            pass
+
+        if not _changed.is_set():
+            return
+
+
+async def run():
+    while True:
+        await _changed.wait()
+        await wait_for_idle()
+
+        # Flash writes stall the core, so they are held back during a motor run
+        await motor.wait_for_idle()
+
+        _changed.clear()
+        _commit.clear()
+
+        # A failed write keeps the changes pending and is retried after the
+        # flush delay, the other tasks keep running meanwhile
+        try:
+            flush()
+        except Exception as e:
+            print(f"Could not save settings because of {e.__class__.__name__}")
+            _changed.set()
@@ -0,0 +1,13 @@
+from array import array
+
+MINUTES_IN_A_DAY = 24 * 60
+
+# A daily schedule is compiled into the sorted minutes of the day it fires at.
+# Repetitions running past midnight wrap into the next day.
+
+
+def compile_minutes(hour, minute, count, rate):
+    start = hour * 60 + minute
+    minutes = {(start + rate * it) % MINUTES_IN_A_DAY for it in range(count)}
+
+    return array("H", sorted(minutes))
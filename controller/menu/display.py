@@ -6,6 +6,7 @@ from adafruit_display_text.bitmap_label import Label
 from adafruit_displayio_sh1106 import SH1106
 
 from controller import config
+from controller.core import boot
 
 DISPLAY_WIDTH = 128
 DISPLAY_HEIGHT = 64
@@ -14,34 +15,190 @@ DISPLAY_XOFFSET = 2
 FONT_WIDTH = 6
 FONT_HEIGHT = 9
 
-displayio.release_displays()
+ROWS = DISPLAY_HEIGHT // FONT_HEIGHT
 
-i2c = busio.I2C(config.I2C_DISPLAY_SCL, config.I2C_DISPLAY_SDA)
-display_bus = displayio.I2CDisplay(i2c, device_address=config.I2C_DISPLAY_ADDRESS)
+# The display is brought up on first use, so importing this module is cheap
+_display = None
 
-display = SH1106(
-    display_bus,
-    width=DISPLAY_WIDTH,
-    height=DISPLAY_HEIGHT,
-    colstart=DISPLAY_XOFFSET,
-    auto_refresh=False,
-    brightness=0.0,
-)
+# The static layer of the current scene is drawn first, then its labels. Labels
+# are kept between renders and shared by all scenes, keyed by position.
+root_group = displayio.Group()
+labels = {}
+
+# Stands in for the static layer of scenes without one
+_blank_layer = displayio.Group()
+root_group.append(_blank_layer)
+
+# Static layers rasterized into bitmaps, keyed by their render commands, as
+# (bitmap, tile grid) pairs. The order lists them least recently used first.
+layers = {}
+layer_order = []
+
+palette = displayio.Palette(2)
+palette[0] = 0x000000
+palette[1] = 0xFFFFFF
+
+_last_layer = ()
+_last_commands = ()
+
+# Static commands drawn as labels, when there was no layer to rasterize them
+_static_labels = ()
+
+
+def get_display():
+    global _display
+
+    if _display is None:
+        displayio.release_displays()
+
+        i2c = busio.I2C(config.I2C_DISPLAY_SCL, config.I2C_DISPLAY_SDA)
+        display_bus = displayio.I2CDisplay(
+            i2c, device_address=config.I2C_DISPLAY_ADDRESS
+        )
+
+        _display = SH1106(
+            display_bus,
+            width=DISPLAY_WIDTH,
+            height=DISPLAY_HEIGHT,
+            colstart=DISPLAY_XOFFSET,
+            auto_refresh=False,
+            brightness=0.0,
+        )
+
+    return _display
 
 
 def init():
-    display.show(displayio.Group())
-    display.auto_refresh = True
+    get_display().show(root_group)
+    refresh()
 
 
-def render(commands):
-    group = displayio.Group()
+def refresh():
+    get_display().refresh()
 
-    for x, y, text in commands:
-        label = Label(terminalio.FONT, text=text, color=0xFFFFFF)
+
+def get_label(x, y):
+    if (label := labels.get((x, y))) is None:
+        label = Label(terminalio.FONT, text="", color=0xFFFFFF)
         label.x = int(FONT_WIDTH * x)
         label.y = int(FONT_HEIGHT * (y + 0.5))
 
-        group.append(label)
+        labels[(x, y)] = label
+        root_group.append(label)
+
+    return label
+
+
+def rasterize(commands, bitmap):
+    # Glyphs are placed like a label at the same position, vertically centered.
+    # They are taller than a line, so their background is not copied.
+    for x, y, text in commands:
+        left = FONT_WIDTH * x
+        middle = int(FONT_HEIGHT * (y + 0.5))
+
+        for char in text:
+            if (glyph := terminalio.FONT.get_glyph(ord(char))) is not None:
+                top = middle - glyph.height // 2
+                tile_left = glyph.tile_index * glyph.width
+
+                bitmap.blit(
+                    left,
+                    max(top, 0),
+                    glyph.bitmap,
+                    x1=tile_left,
+                    y1=max(-top, 0),
+                    x2=tile_left + glyph.width,
+                    y2=glyph.height,
+                    skip_index=0,
+                )
+
+            left += FONT_WIDTH
+
+
+def take_layer():
+    # Once the cache is full or the heap runs low, the least recently used
+    # layer is drawn over, so cached layers never fragment the heap
+    full = len(layer_order) >= config.DISPLAY_LAYER_CACHE
+    mem_free = boot.get_mem_free()
+    low = mem_free is not None and mem_free < config.DISPLAY_LAYER_MIN_FREE
+
+    if full or low:
+        return evict_layer()
+
+    try:
+        bitmap = displayio.Bitmap(DISPLAY_WIDTH, DISPLAY_HEIGHT, 2)
+    except MemoryError:
+        return evict_layer()
+
+    return bitmap, displayio.TileGrid(bitmap, pixel_shader=palette)
+
+
+def evict_layer():
+    # The layer on screen is still in the group and can't be drawn over, so
+    # None is returned if it is the only one
+    for commands in layer_order:
+        if (layer := layers[commands])[1] is not root_group[0]:
+            layer_order.remove(commands)
+            del layers[commands]
+            layer[0].fill(0)
+
+            return layer
+
+    return None
+
+
+def get_layer(commands):
+    if (layer := layers.get(commands)) is None:
+        if (layer := take_layer()) is None:
+            return None
+
+        rasterize(commands, layer[0])
+        layers[commands] = layer
+    else:
+        layer_order.remove(commands)
+
+    layer_order.append(commands)
+    return layer
+
+
+def show_labels(commands, visible):
+    for x, y, text in commands:
+        label = get_label(x, y)
+        if label.text != text:
+            label.text = text
+
+        label.hidden = False
+        visible.add((x, y))
+
+
+def render(layer, commands):
+    # The static layer is rasterized once, only commands are drawn as labels
+    global _last_layer, _last_commands, _static_labels
+
+    if layer == _last_layer and commands == _last_commands:
+        return False
+
+    if layer != _last_layer:
+        if layer and (cached := get_layer(layer)) is not None:
+            item = cached[1]
+            _static_labels = ()
+        else:
+            item = _blank_layer
+            _static_labels = layer
+
+        # Putting an item back into the group it is in raises ValueError
+        if root_group[0] is not item:
+            root_group[0] = item
+
+    visible = set()
+
+    show_labels(_static_labels, visible)
+    show_labels(commands, visible)
+
+    for position, label in labels.items():
+        if position not in visible:
+            label.hidden = True
 
-    display.show(group)
+    _last_layer = layer
+    _last_commands = commands
+    return True
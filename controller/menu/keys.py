@@ -1,18 +1,107 @@
+import time
 from keypad import Keys
 
+import asyncio
+
 from controller import config
 
 device = Keys(config.BUTTONS, value_when_pressed=False)
 
+# Time spent polling the key queue, to measure the duty cycle of the menu task
+stats = {
+    "polls": 0,
+    "busy_ns": 0,
+    "since_ns": 0,
+}
+
+# Keys being held down, mapped to [next repeat time, repeat count]
+held = {}
+
+_poll_interval = config.KEYS_POLL_FAST
+_last_activity_ns = 0
+
+
+class KeyEvent:
+    def __init__(self, key_number, repeat=0):
+        self.key_number = key_number
+        self.repeat = repeat
+
+    @property
+    def multiplier(self):
+        multiplier = 1
+
+        for count, value in config.KEYS_REPEAT_ACCELERATION:
+            if self.repeat >= count:
+                multiplier = value
+
+        return multiplier
+
 
 def init():
-    pass
+    reset_stats()
+
+
+def reset_stats():
+    stats["polls"] = 0
+    stats["busy_ns"] = 0
+    stats["since_ns"] = time.monotonic_ns()
+
+
+def get_duty_cycle():
+    elapsed_ns = time.monotonic_ns() - stats["since_ns"]
+    if not elapsed_ns:
+        return 0.0
+
+    return stats["busy_ns"] / elapsed_ns
+
+
+def get_events(now_ns):
+    events = []
+
+    while event := device.events.get():
+        if event.pressed:
+            held[event.key_number] = [now_ns + to_ns(config.KEYS_REPEAT_DELAY), 0]
+            events.append(KeyEvent(event.key_number))
+        else:
+            held.pop(event.key_number, None)
+
+    for key_number, hold in held.items():
+        if now_ns >= hold[0]:
+            hold[0] = now_ns + to_ns(1 / config.KEYS_REPEAT_RATE)
+            hold[1] += 1
+            events.append(KeyEvent(key_number, repeat=hold[1]))
+
+    return events
+
+
+def to_ns(seconds):
+    return int(seconds * 1_000_000_000)
+
+
+def update_poll_interval(now_ns, active):
+    global _poll_interval, _last_activity_ns
+
+    if active:
+        _last_activity_ns = now_ns
+
+    # Poll quickly right after activity and back off while the keys are idle
+    if now_ns - _last_activity_ns < to_ns(config.KEYS_ACTIVE_WINDOW):
+        _poll_interval = config.KEYS_POLL_FAST
+    else:
+        _poll_interval = min(_poll_interval * 2, config.KEYS_POLL_SLOW)
+
+
+async def wait_for_events():
+    while True:
+        start_ns = time.monotonic_ns()
 
+        events = get_events(start_ns)
+        update_poll_interval(start_ns, bool(events or held))
 
-def get_event():
-    event = device.events.get()
+        stats["polls"] += 1
+        stats["busy_ns"] += time.monotonic_ns() - start_ns
 
-    if not event or not event.pressed:
-        return None
+        if events:
+            return events
 
-    return event
+        await asyncio.sleep(_poll_interval)
@@ -1,25 +1,39 @@
 from controller import config
 
-strings = {
-    "en": {},
-    "pl": {
-        "Close now": "Zamknij teraz",
-        "Done": "Gotowe",
-        "Duration": "Dlugosc",
-        "Enter new value:": "Podaj nowa wartosc:",
-        "Hour": "Godzina",
-        "Minute": "Minuta",
-        "Open now": "Otworz teraz",
-        "Repeat count": "Powtorz razy",
-        "Repeat every": "Powtorz co",
-        "Set system time first": "Najpierw ustaw zegar",
-        "Speed": "Predkosc",
-        "System clock not set": "Nie ustawiono zegara",
-        "System hour": "Godzina zegara",
-        "System minute": "Minuta zegara",
-    },
-}
+SOURCE_LOCALE = "en"
+
+# Every catalog is a text file of "English<TAB>translation" lines, named after
+# its locale. Only the active one is read, on first use.
+CATALOG_DIR = __file__.rsplit("/", 1)[0] + "/locales"
+
+_catalog = None
+
+
+def load_catalog(locale):
+    catalog = {}
+
+    if locale == SOURCE_LOCALE:
+        return catalog
+
+    try:
+        with open(f"{CATALOG_DIR}/{locale}.txt") as f:
+            for line in f:
+                line = line.rstrip("\r\n")
+                if not line or line.startswith("#"):
+                    continue
+
+                text, translation = line.split("\t")
+                catalog[text] = translation
+    except OSError:
+        print(f"No menu catalog for locale '{locale}'")
+
+    return catalog
 
 
 def gettext(text):
-    return strings.get(config.MENU_LOCALE, {}).get(text, text)
+    global _catalog
+
+    if _catalog is None:
+        _catalog = load_catalog(config.MENU_LOCALE)
+
+    return _catalog.get(text, text)
@@ -0,0 +1,164 @@
+from controller import constants
+from controller.core import boot, journal, metrics, rtc
+from controller.service import control, system
+
+# The menu is described by the table below and interpreted by the generic
+# scenes, so adding a setting only takes a new row. Pages are laid out one
+# item per line, in order.
+
+
+class Field:
+    def __init__(
+        self,
+        key,
+        label,
+        getter,
+        setter,
+        min_value,
+        max_value,
+        step=1,
+        digits=0,
+        unit="",
+    ):
+        self.key = key
+        self.label = label
+        self.getter = getter
+        self.setter = setter
+        self.min_value = min_value
+        self.max_value = max_value
+        self.step = step
+        self.digits = digits
+        self.unit = unit
+
+
+class Action:
+    def __init__(self, key, label, handler):
+        self.key = key
+        self.label = label
+        self.handler = handler
+
+
+class Report:
+    def __init__(self, key, label, getter):
+        self.key = key
+        self.label = label
+        self.getter = getter
+
+
+class Page:
+    def __init__(self, key, items, footer=None):
+        self.key = key
+        self.items = items
+        self.footer = footer
+
+
+def make_control_field(motor_id, key, label, min_value, max_value, **kwargs):
+    def getter():
+        return control.get_value(motor_id, key)
+
+    def setter(value):
+        control.set_value(motor_id, key, value)
+
+    return Field(key, label, getter, setter, min_value, max_value, **kwargs)
+
+
+def make_oneshot_action(motor_id, label):
+    def handler():
+        if not rtc.is_set():
+            return "Set system time first"
+
+        control.run_oneshot(motor_id)
+        return "Done"
+
+    return Action("now", label, handler)
+
+
+def make_control_page(key, motor_id, label):
+    return Page(
+        key,
+        (
+            make_oneshot_action(motor_id, label),
+            make_control_field(
+                motor_id,
+                constants.DURATION_KEY,
+                "Duration",
+                constants.DURATION_MIN,
+                constants.DURATION_MAX,
+                unit="s",
+            ),
+            make_control_field(
+                motor_id,
+                constants.SPEED_KEY,
+                "Speed",
+                constants.SPEED_MIN,
+                constants.SPEED_MAX,
+                unit="%",
+            ),
+            make_control_field(
+                motor_id,
+                constants.HOUR_KEY,
+                "Hour",
+                constants.HOUR_MIN,
+                constants.HOUR_MAX,
+                digits=2,
+            ),
+            make_control_field(
+                motor_id,
+                constants.MINUTE_KEY,
+                "Minute",
+                constants.MINUTE_MIN,
+                constants.MINUTE_MAX,
+                digits=2,
+            ),
+            make_control_field(
+                motor_id,
+                constants.COUNT_KEY,
+                "Repeat count",
+                constants.COUNT_MIN,
+                constants.COUNT_MAX,
+            ),
+            make_control_field(
+                motor_id,
+                constants.RATE_KEY,
+                "Repeat every",
+                constants.RATE_MIN,
+                constants.RATE_MAX,
+                unit="m",
+            ),
+        ),
+    )
+
+
+OPEN_PAGE = make_control_page("open", constants.MOTOR_OPEN_ID, "Open now")
+CLOSE_PAGE = make_control_page("close", constants.MOTOR_CLOSE_ID, "Close now")
+
+SYSTEM_PAGE = Page(
+    "system",
+    (
+        Field(
+            constants.HOUR_KEY,
+            "System hour",
+            system.get_hour,
+            system.set_hour,
+            constants.HOUR_MIN,
+            constants.HOUR_MAX,
+            digits=2,
+        ),
+        Field(
+            constants.MINUTE_KEY,
+            "System minute",
+            system.get_minute,
+            system.set_minute,
+            constants.MINUTE_MIN,
+            constants.MINUTE_MAX,
+            digits=2,
+        ),
+        Report("boot", "Boot report", boot.get_report),
+        Report("history", "History", journal.get_report),
+        Report("diagnostics", "Diagnostics", metrics.get_report),
+    ),
+    footer=system.get_system_info,
+)
+
+# Left and right keys cycle through the idle screen and these pages
+PAGES = (OPEN_PAGE, CLOSE_PAGE, SYSTEM_PAGE)
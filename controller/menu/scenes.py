@@ -1,10 +1,11 @@
 import asyncio
+import time
 
-from controller import constants
-from controller.core import rtc
-from controller.menu import display, keys
+from controller import config
+from controller.core import metrics, motor, rtc, scheduler
+from controller.menu import display, keys, menu
 from controller.menu.locale import gettext as _
-from controller.service import control, system
+from controller.service import control
 
 BUTTON_LEFT = 0
 BUTTON_DOWN = 1
@@ -12,6 +13,9 @@ BUTTON_UP = 2
 BUTTON_RIGHT = 3
 BUTTON_OK = 4
 
+# Kept between the end of a refresh and a motor or scheduler deadline
+REFRESH_GUARD_NS = 5_000_000
+
 
 def format_number(number, digits=0):
     if number is None:
@@ -20,12 +24,22 @@ def format_number(number, digits=0):
     return f"{number:0{digits}d}".replace("0", "O")
 
 
-# Base scenes
+# Scenes
 
 
 class Scene:
-    def __init__(self, manager, parent):
+    # Scenes look up their translated strings once, when they are built. Text
+    # that never changes goes into the static layer, which the display keeps
+    # rasterized, the rest is returned as render data on every frame.
+    repeat_keys = ()
+
+    def __init__(self, manager, node):
         self.manager = manager
+        self.node = node
+        self.parent = None
+        self.static_data = ()
+
+    def enter(self, parent):
         self.parent = parent
 
     def get_render_data(self):
@@ -35,25 +49,67 @@ class Scene:
         pass
 
 
+class IdleScene(Scene):
+    def __init__(self, manager, node):
+        super().__init__(manager, node)
+        self.clock_not_set = ((0, 0, _("System clock not set")),)
+
+    def enter(self, parent):
+        super().enter(parent)
+        control.commit()
+
+    def handle_event(self, event):
+        if event.key_number == BUTTON_LEFT:
+            self.manager.switch_page(-1)
+        if event.key_number == BUTTON_RIGHT:
+            self.manager.switch_page(1)
+
+    def get_render_data(self):
+        if not rtc.is_set():
+            return self.clock_not_set
+
+        return ()
+
+
 class OptionsScene(Scene):
-    def __init__(self, manager, parent):
-        super().__init__(manager, parent)
+    # The cursor position is kept while the scene stays cached
+    repeat_keys = (BUTTON_DOWN, BUTTON_UP)
 
+    def __init__(self, manager, node):
+        super().__init__(manager, node)
+        self.static_data = self.build_static_data()
         self.position = 0
-        self.children = []
+
+    def build_static_data(self):
+        data = []
+
+        for row, item in enumerate(self.node.items):
+            data.append((1, row, _(item.label)))
+
+            if isinstance(item, menu.Field) and item.unit:
+                data.append((20, row, item.unit))
+
+        return tuple(data)
 
     def move_cursor_up(self):
         self.position = max(self.position - 1, 0)
 
     def move_cursor_down(self):
-        self.position = min(self.position + 1, len(self.children) - 1)
+        self.position = min(self.position + 1, len(self.node.items) - 1)
 
     def get_render_data(self):
-        return ((0, self.position, "*"),)
+        data = [(0, self.position, "*")]
 
-    def handle_event(self, event):
-        super().handle_event(event)
+        for row, item in enumerate(self.node.items):
+            if isinstance(item, menu.Field):
+                data.append((16, row, format_number(item.getter(), item.digits)))
+
+        if self.node.footer is not None:
+            data.append((0, 6, self.node.footer()))
+
+        return tuple(data)
 
+    def handle_event(self, event):
         if event.key_number == BUTTON_DOWN:
             self.move_cursor_down()
             self.manager.render()
@@ -61,433 +117,243 @@ class OptionsScene(Scene):
             self.move_cursor_up()
             self.manager.render()
         if event.key_number == BUTTON_OK:
-            scene_class = self.children[self.position]
-            self.manager.switch_to_new_scene(scene_class, store_parent=True)
+            item = self.node.items[self.position]
+            self.manager.switch_to_scene(item, store_parent=True)
+        if event.key_number == BUTTON_LEFT:
+            self.manager.switch_page(-1)
+        if event.key_number == BUTTON_RIGHT:
+            self.manager.switch_page(1)
 
 
 class EntryScene(Scene):
-    digits = 0
-    min_value = 0
-    max_value = 0
+    repeat_keys = (BUTTON_LEFT, BUTTON_DOWN, BUTTON_UP, BUTTON_RIGHT)
 
-    def __init__(self, manager, parent):
-        super().__init__(manager, parent)
+    def __init__(self, manager, node):
+        super().__init__(manager, node)
+        self.static_data = ((0, 0, _("Enter new value:")),)
         self.current_value = None
 
-    def decrease_value(self, step=1):
+    def enter(self, parent):
+        super().enter(parent)
+        self.current_value = self.node.getter()
+
+    def decrease_value(self, step):
         if self.current_value is None:
             return
 
-        self.current_value = max(self.current_value - step, self.min_value)
+        self.current_value = max(self.current_value - step, self.node.min_value)
 
-    def increase_value(self, step=1):
+    def increase_value(self, step):
         if self.current_value is None:
-            self.current_value = -step
+            self.current_value = self.node.min_value - step
 
-        self.current_value = min(self.current_value + step, self.max_value)
+        self.current_value = min(self.current_value + step, self.node.max_value)
 
     def get_render_data(self):
-        value = self.current_value
-
-        return (
-            (0, 0, _("Enter new value:")),
-            (0, 2, format_number(value, digits=self.digits)),
-        )
+        return ((0, 2, format_number(self.current_value, self.node.digits)),)
 
     def handle_event(self, event):
-        super().handle_event(event)
+        step = self.node.step * event.multiplier
+        intermediate = bool(event.repeat)
 
         if event.key_number == BUTTON_LEFT:
-            self.decrease_value(10)
-            self.manager.render()
+            self.decrease_value(10 * step)
+            self.manager.render(intermediate)
         if event.key_number == BUTTON_DOWN:
-            self.decrease_value()
-            self.manager.render()
+            self.decrease_value(step)
+            self.manager.render(intermediate)
         if event.key_number == BUTTON_UP:
-            self.increase_value()
-            self.manager.render()
-        if event.key_number == BUTTON_RIGHT:
-            self.increase_value(10)
-            self.manager.render()
-
-
-class HourEntryScene(EntryScene):
-    digits = 2
-    min_value = constants.HOUR_MIN
-    max_value = constants.HOUR_MAX
-
-
-class MinuteEntryScene(EntryScene):
-    digits = 2
-    min_value = constants.MINUTE_MIN
-    max_value = constants.MINUTE_MAX
-
-
-# Scene implementations
-
-
-class IdleScene(Scene):
-    def handle_event(self, event):
-        if event.key_number == BUTTON_LEFT:
-            self.manager.switch_to_new_scene(SystemOptionsScene)
+            self.increase_value(step)
+            self.manager.render(intermediate)
         if event.key_number == BUTTON_RIGHT:
-            self.manager.switch_to_new_scene(OpenOptionsScene)
-
-    def get_render_data(self):
-        if rtc.get_datetime() is None:
-            return ((0, 0, _("System clock not set")),)
-
-        return ()
-
-
-class ControlOptionsScene(OptionsScene):
-    motor_id = None
-
-    def get_render_data(self):
-        duration = control.get_duration(self.motor_id)
-        speed = control.get_speed(self.motor_id)
-        hour = control.get_hour(self.motor_id)
-        minute = control.get_minute(self.motor_id)
-        count = control.get_count(self.motor_id)
-        rate = control.get_rate(self.motor_id)
-
-        return super().get_render_data() + (
-            (1, 1, _("Duration")),
-            (1, 2, _("Speed")),
-            (1, 3, _("Hour")),
-            (1, 4, _("Minute")),
-            (1, 5, _("Repeat count")),
-            (1, 6, _("Repeat every")),
-            (16, 1, format_number(duration)),
-            (16, 2, format_number(speed)),
-            (16, 3, format_number(hour, digits=2)),
-            (16, 4, format_number(minute, digits=2)),
-            (16, 5, format_number(count)),
-            (16, 6, format_number(rate)),
-            (20, 1, "s"),
-            (20, 2, "%"),
-            (20, 6, "m"),
-        )
-
-
-class ControlNowScene(Scene):
-    motor_id = None
-
-    def __init__(self, manager, parent):
-        super().__init__(manager, parent)
-        self.success = bool(rtc.get_datetime())
-
-        if self.success:
-            control.run_oneshot(self.motor_id)
-
-    def get_render_data(self):
-        return (
-            (0, 0, _("Done") if self.success else _("Set system time first")),
-            (19, 6, _("OK")),
-        )
-
-    def handle_event(self, event):
-        self.manager.switch_to_parent_scene()
-
-
-class ControlDurationScene(EntryScene):
-    motor_id = None
-
-    min_value = constants.DURATION_MIN
-    max_value = constants.DURATION_MAX
-
-    def __init__(self, manager, parent):
-        super().__init__(manager, parent)
-        self.current_value = control.get_duration(self.motor_id)
-
-    def handle_event(self, event):
-        super().handle_event(event)
-
+            self.increase_value(10 * step)
+            self.manager.render(intermediate)
         if event.key_number == BUTTON_OK:
-            control.set_duration(self.motor_id, self.current_value)
+            if self.current_value is not None:
+                self.node.setter(self.current_value)
             self.manager.switch_to_parent_scene()
 
 
-class ControlSpeedScene(EntryScene):
-    motor_id = None
-
-    min_value = constants.SPEED_MIN
-    max_value = constants.SPEED_MAX
-
-    def __init__(self, manager, parent):
-        super().__init__(manager, parent)
-        self.current_value = control.get_speed(self.motor_id)
-
-    def handle_event(self, event):
-        super().handle_event(event)
-
-        if event.key_number == BUTTON_OK:
-            control.set_speed(self.motor_id, self.current_value)
-            self.manager.switch_to_parent_scene()
-
-
-class ControlHourScene(HourEntryScene):
-    motor_id = None
-
-    def __init__(self, manager, parent):
-        super().__init__(manager, parent)
-        self.current_value = control.get_hour(self.motor_id)
-
-    def handle_event(self, event):
-        super().handle_event(event)
-
-        if event.key_number == BUTTON_OK:
-            control.set_hour(self.motor_id, self.current_value)
-            self.manager.switch_to_parent_scene()
-
-
-class ControlMinuteScene(MinuteEntryScene):
-    motor_id = None
-
-    def __init__(self, manager, parent):
-        super().__init__(manager, parent)
-        self.current_value = control.get_minute(self.motor_id)
-
-    def handle_event(self, event):
-        super().handle_event(event)
-
-        if event.key_number == BUTTON_OK:
-            control.set_minute(self.motor_id, self.current_value)
-            self.manager.switch_to_parent_scene()
-
+class ActionScene(Scene):
+    def __init__(self, manager, node):
+        super().__init__(manager, node)
+        self.static_data = ((19, 6, _("OK")),)
+        self.message = None
 
-class ControlCountScene(EntryScene):
-    motor_id = None
-
-    min_value = constants.COUNT_MIN
-    max_value = constants.COUNT_MAX
-
-    def __init__(self, manager, parent):
-        super().__init__(manager, parent)
-        self.current_value = control.get_count(self.motor_id)
-
-    def handle_event(self, event):
-        super().handle_event(event)
-
-        if event.key_number == BUTTON_OK:
-            control.set_count(self.motor_id, self.current_value)
-            self.manager.switch_to_parent_scene()
-
-
-class ControlRateScene(EntryScene):
-    motor_id = None
-
-    min_value = constants.RATE_MIN
-    max_value = constants.RATE_MAX
-
-    def __init__(self, manager, parent):
-        super().__init__(manager, parent)
-        self.current_value = control.get_rate(self.motor_id)
-
-    def handle_event(self, event):
-        super().handle_event(event)
-
-        if event.key_number == BUTTON_OK:
-            control.set_rate(self.motor_id, self.current_value)
-            self.manager.switch_to_parent_scene()
-
-
-class OpenMotorMixin:
-    motor_id = constants.MOTOR_OPEN_ID
-
-
-class OpenOptionsScene(OpenMotorMixin, ControlOptionsScene):
-    def __init__(self, manager, parent):
-        super().__init__(manager, parent)
-
-        self.children = (
-            OpenNowScene,
-            OpenDurationScene,
-            OpenSpeedScene,
-            OpenHourScene,
-            OpenMinuteScene,
-            OpenCountScene,
-            OpenRateScene,
-        )
+    def enter(self, parent):
+        super().enter(parent)
+        self.message = _(self.node.handler())
 
     def get_render_data(self):
-        return super().get_render_data() + ((1, 0, _("Open now")),)
+        return ((0, 0, self.message),)
 
     def handle_event(self, event):
-        super().handle_event(event)
-
-        if event.key_number == BUTTON_LEFT:
-            self.manager.switch_to_new_scene(IdleScene)
-        if event.key_number == BUTTON_RIGHT:
-            self.manager.switch_to_new_scene(CloseOptionsScene)
-
-
-class OpenNowScene(OpenMotorMixin, ControlNowScene):
-    pass
-
-
-class OpenDurationScene(OpenMotorMixin, ControlDurationScene):
-    pass
-
-
-class OpenSpeedScene(OpenMotorMixin, ControlSpeedScene):
-    pass
-
-
-class OpenHourScene(OpenMotorMixin, ControlHourScene):
-    pass
-
-
-class OpenMinuteScene(OpenMotorMixin, ControlMinuteScene):
-    pass
-
-
-class OpenCountScene(OpenMotorMixin, ControlCountScene):
-    pass
-
-
-class OpenRateScene(OpenMotorMixin, ControlRateScene):
-    pass
-
+        self.manager.switch_to_parent_scene()
 
-class CloseMotorMixin:
-    motor_id = constants.MOTOR_CLOSE_ID
 
+class ReportScene(Scene):
+    # Reports longer than the display are scrolled a line at a time
+    repeat_keys = (BUTTON_DOWN, BUTTON_UP)
 
-class CloseOptionsScene(CloseMotorMixin, ControlOptionsScene):
-    def __init__(self, manager, parent):
-        super().__init__(manager, parent)
+    def __init__(self, manager, node):
+        super().__init__(manager, node)
+        self.empty = ((0, 0, _("Nothing to show")),)
+        self.offset = 0
 
-        self.children = (
-            CloseNowScene,
-            CloseDurationScene,
-            CloseSpeedScene,
-            CloseHourScene,
-            CloseMinuteScene,
-            CloseCountScene,
-            CloseRateScene,
-        )
+    def enter(self, parent):
+        super().enter(parent)
+        self.offset = 0
 
     def get_render_data(self):
-        return super().get_render_data() + ((1, 0, _("Close now")),)
-
-    def handle_event(self, event):
-        super().handle_event(event)
-
-        if event.key_number == BUTTON_LEFT:
-            self.manager.switch_to_new_scene(OpenOptionsScene)
-        if event.key_number == BUTTON_RIGHT:
-            self.manager.switch_to_new_scene(SystemOptionsScene)
-
+        if not (lines := self.node.getter()):
+            return self.empty
 
-class CloseNowScene(CloseMotorMixin, ControlNowScene):
-    pass
+        self.offset = min(self.offset, max(len(lines) - display.ROWS, 0))
+        lines = lines[self.offset : self.offset + display.ROWS]
 
+        return tuple((0, row, line) for row, line in enumerate(lines))
 
-class CloseDurationScene(CloseMotorMixin, ControlDurationScene):
-    pass
+    def handle_event(self, event):
+        if event.key_number == BUTTON_DOWN:
+            self.offset += 1
+            self.manager.render()
+        elif event.key_number == BUTTON_UP:
+            self.offset = max(self.offset - 1, 0)
+            self.manager.render()
+        else:
+            self.manager.switch_to_parent_scene()
 
 
-class CloseSpeedScene(CloseMotorMixin, ControlSpeedScene):
-    pass
+def get_scene_class(node):
+    if node is None:
+        return IdleScene
+    if isinstance(node, menu.Page):
+        return OptionsScene
+    if isinstance(node, menu.Field):
+        return EntryScene
+    if isinstance(node, menu.Report):
+        return ReportScene
 
+    return ActionScene
 
-class CloseHourScene(CloseMotorMixin, ControlHourScene):
-    pass
 
+# Scene manager
 
-class CloseMinuteScene(CloseMotorMixin, ControlMinuteScene):
-    pass
 
+class SceneManager:
+    def __init__(self):
+        self.current_scene = None
 
-class CloseCountScene(CloseMotorMixin, ControlCountScene):
-    pass
+        # Scenes are built on first use and reused afterwards, keyed by node
+        self.scenes = {}
+        self.page = 0
 
+        self.dirty = asyncio.Event()
+        self.intermediate = False
 
-class CloseRateScene(CloseMotorMixin, ControlRateScene):
-    pass
+        # When the first key handled since the last frame was pressed
+        self.key_ns = 0
 
+        # Slowest recent refresh, decaying so one stall is eventually forgotten
+        self.draw_ns = 0
 
-class SystemOptionsScene(OptionsScene):
-    def __init__(self, manager, parent):
-        super().__init__(manager, parent)
+        self.switch_to_scene(None)
 
-        self.children = (SystemHourScene, SystemMinuteScene)
+    def get_scene(self, node):
+        if (scene := self.scenes.get(node)) is None:
+            scene = get_scene_class(node)(self, node)
+            self.scenes[node] = scene
 
-    def get_render_data(self):
-        hour = system.get_hour()
-        minute = system.get_minute()
+        return scene
 
-        return super().get_render_data() + (
-            (1, 0, _("System hour")),
-            (1, 1, _("System minute")),
-            (16, 0, format_number(hour, digits=2)),
-            (16, 1, format_number(minute, digits=2)),
-            (0, 6, system.get_system_info()),
-        )
+    def switch_page(self, offset):
+        # Page 0 is the idle screen, followed by the menu pages
+        self.page = (self.page + offset) % (len(menu.PAGES) + 1)
+        self.switch_to_scene(menu.PAGES[self.page - 1] if self.page else None)
 
-    def handle_event(self, event):
-        super().handle_event(event)
+    def switch_to_parent_scene(self):
+        if parent := self.current_scene.parent:
+            print(f"Returning to {parent.__class__.__name__}")
+            self.current_scene = parent
+            self.render()
 
-        if event.key_number == BUTTON_LEFT:
-            self.manager.switch_to_new_scene(CloseOptionsScene)
-        if event.key_number == BUTTON_RIGHT:
-            self.manager.switch_to_new_scene(IdleScene)
+    def switch_to_scene(self, node, store_parent=False):
+        parent = self.current_scene if store_parent else None
+        scene = self.get_scene(node)
 
+        print(f"Switching to {scene.__class__.__name__}")
+        scene.enter(parent)
+        self.current_scene = scene
+        self.render()
 
-class SystemHourScene(HourEntryScene):
-    def __init__(self, manager, parent):
-        super().__init__(manager, parent)
-        self.current_value = system.get_hour()
+    def render(self, intermediate=False):
+        metrics.count("renders")
+        self.intermediate = intermediate
+        self.dirty.set()
 
-    def handle_event(self, event):
-        super().handle_event(event)
+    def get_draw_delay(self):
+        # A refresh blocks the event loop, so it is postponed past any motor
+        # stop or scheduler wakeup that it would otherwise delay
+        now_ns = time.monotonic_ns()
+        end_ns = now_ns + self.draw_ns + REFRESH_GUARD_NS
+        delay_ns = 0
 
-        if event.key_number == BUTTON_OK:
-            system.set_hour(self.current_value)
-            self.manager.switch_to_parent_scene()
+        deadlines = motor.get_deadlines_ns()
+        if (wakeup_ns := scheduler.get_wakeup_ns()) is not None:
+            deadlines.append(wakeup_ns)
 
+        for deadline_ns in deadlines:
+            if now_ns <= deadline_ns < end_ns:
+                delay_ns = max(delay_ns, deadline_ns - now_ns + REFRESH_GUARD_NS)
 
-class SystemMinuteScene(MinuteEntryScene):
-    def __init__(self, manager, parent):
-        super().__init__(manager, parent)
-        self.current_value = system.get_minute()
+        return delay_ns / 1_000_000_000
 
-    def handle_event(self, event):
-        super().handle_event(event)
+    def draw(self):
+        start_ns = metrics.start()
 
-        if event.key_number == BUTTON_OK:
-            system.set_minute(self.current_value)
-            self.manager.switch_to_parent_scene()
+        scene = self.current_scene
 
+        if display.render(scene.static_data, scene.get_render_data()):
+            display.refresh()
 
-# Scene manager
+        metrics.count("frames")
+        metrics.stop(scene.__class__.__name__, start_ns)
 
+    async def render_loop(self):
+        while True:
+            await self.dirty.wait()
+            self.dirty.clear()
 
-class SceneManager:
-    def __init__(self):
-        self.current_scene = None
-        self.switch_to_new_scene(IdleScene)
+            if self.intermediate:
+                frame_ns = 1_000_000_000 // config.DISPLAY_REPEAT_FPS
+            else:
+                frame_ns = 1_000_000_000 // config.DISPLAY_MAX_FPS
 
-    def switch_to_parent_scene(self):
-        if parent := self.current_scene.parent:
-            print(f"Returning to {parent.__class__.__name__}")
-            self.current_scene = parent
-            self.render()
+            while delay := self.get_draw_delay():
+                metrics.count("deferrals")
+                await asyncio.sleep(delay)
 
-    def switch_to_new_scene(self, scene_class, store_parent=False):
-        parent = self.current_scene if store_parent else None
+            start_ns = time.monotonic_ns()
+            self.draw()
 
-        print(f"Switching to {scene_class.__name__}")
-        self.current_scene = scene_class(self, parent)
-        self.render()
+            metrics.stop("key>px", self.key_ns)
+            self.key_ns = 0
 
-    def render(self):
-        display.render(self.current_scene.get_render_data())
+            # Invalidations made until the next frame are coalesced into it
+            elapsed_ns = time.monotonic_ns() - start_ns
+            self.draw_ns = max(elapsed_ns, self.draw_ns - self.draw_ns // 8)
+            await asyncio.sleep(max(frame_ns - elapsed_ns, 0) / 1_000_000_000)
 
     async def poll(self):
         while True:
-            event = keys.get_event()
-            if event:
-                self.current_scene.handle_event(event)
-            await asyncio.sleep(0)
+            for event in await keys.wait_for_events():
+                scene = self.current_scene
+                if event.repeat and event.key_number not in scene.repeat_keys:
+                    continue
+
+                if not self.key_ns:
+                    self.key_ns = metrics.start()
+
+                start_ns = metrics.start()
+                scene.handle_event(event)
+                metrics.stop("keys", start_ns)
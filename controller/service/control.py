@@ -19,13 +19,26 @@ def _set_value(motor_id, key, value):
     state.data.setdefault(motor_id, dict(default_state))[key] = value
 
     state.save_state()
-    scheduler.init()
+    scheduler.update_motor(motor_id, key)
+
+
+def commit():
+    state.commit()
 
 
 def run_oneshot(motor_id):
+    scheduler.cancel(motor_id)
     scheduler.request_oneshot(motor_id)
 
 
+def get_value(motor_id, key):
+    return _get_value(motor_id, key, default_state[key])
+
+
+def set_value(motor_id, key, value):
+    _set_value(motor_id, key, value)
+
+
 def get_duration(motor_id):
     return _get_value(motor_id, constants.DURATION_KEY, constants.DURATION_DEFAULT)
 
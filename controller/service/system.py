@@ -6,18 +6,18 @@ from controller.core import rtc, scheduler
 
 
 def get_hour():
-    try:
-        return rtc.get_datetime().tm_hour
-    except AttributeError:
+    if (minute_of_day := rtc.get_minute_of_day()) is None:
         return None
 
+    return minute_of_day // 60
+
 
 def get_minute():
-    try:
-        return rtc.get_datetime().tm_min
-    except AttributeError:
+    if (minute_of_day := rtc.get_minute_of_day()) is None:
         return None
 
+    return minute_of_day % 60
+
 
 def get_system_info():
     firmware_version = constants.FIRMWARE_VERSION
@@ -26,17 +26,25 @@ def get_system_info():
     return f"v{firmware_version}/v{circuitpy_version}"
 
 
+def get_date():
+    # Changing the time keeps the date, so the scheduler sees a small jump
+    if (dt := rtc.get_datetime()) is None:
+        return 2000, 1, 1
+
+    return dt.tm_year, dt.tm_mon, dt.tm_mday
+
+
 def set_hour(hour):
     minute = get_minute() or 0
-    dt = struct_time((2000, 1, 1, hour, minute, 0, -1, -1, -1))
+    dt = struct_time(get_date() + (hour, minute, 0, -1, -1, -1))
 
     rtc.set_datetime(dt)
-    scheduler.init()
+    scheduler.clock_changed()
 
 
 def set_minute(minute):
     hour = get_hour() or 0
-    dt = struct_time((2000, 1, 1, hour, minute, 0, -1, -1, -1))
+    dt = struct_time(get_date() + (hour, minute, 0, -1, -1, -1))
 
     rtc.set_datetime(dt)
-    scheduler.init()
+    scheduler.clock_changed()
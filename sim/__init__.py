@@ -0,0 +1,12 @@
+from sim import clock, display, gpio, keypad, nvm, rtc
+
+
+def install(*, nvm_size=4096):
+    # Must run before anything from controller is imported
+    clock.install()
+    gpio.install()
+    keypad.install()
+    display.install()
+    rtc.install()
+
+    return nvm.install(nvm_size)
@@ -0,0 +1,147 @@
+import argparse
+import ast
+import calendar
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sim
+
+SECONDS_IN_A_DAY = 60 * 60 * 24
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run code.py on simulated hardware")
+    parser.add_argument("--days", type=float, default=7.0)
+    parser.add_argument("--start", default="2024-01-01T00:00", help="UTC time")
+    parser.add_argument(
+        "--set",
+        action="append",
+        default=[],
+        metavar="MOTOR.KEY=VALUE",
+        help="store a setting before boot, e.g. o.h=6",
+    )
+    parser.add_argument(
+        "--config",
+        action="append",
+        default=[],
+        metavar="NAME=VALUE",
+        help="override controller.config, e.g. SCHEDULER_CATCH_UP='all'",
+    )
+    parser.add_argument("--lost-power", action="store_true")
+    parser.add_argument(
+        "--rtc-drift",
+        type=float,
+        default=0.0,
+        metavar="PPM",
+        help="how much faster the external RTC runs than the board",
+    )
+    parser.add_argument(
+        "--keys",
+        default="",
+        metavar="SECONDS:KEY,...",
+        help="tap keys at the given times after boot, e.g. 5:3,6:4",
+    )
+    parser.add_argument(
+        "--poll-slow",
+        type=float,
+        default=60.0,
+        help="idle key poll interval, raised to keep long runs fast",
+    )
+    parser.add_argument("--quiet", action="store_true")
+
+    return parser.parse_args()
+
+
+def store_settings(settings):
+    from controller.core import nvm
+
+    data = {}
+    for setting in settings:
+        name, value = setting.split("=")
+        motor_id, key = name.split(".")
+        data.setdefault(motor_id, {})[key] = int(value)
+
+    if data:
+        nvm.write_nvm(data)
+
+
+async def tap_keys(script):
+    import asyncio
+
+    from sim.keypad import Keys
+
+    elapsed = 0.0
+    for step in filter(None, script.split(",")):
+        at, key_number = step.split(":")
+
+        await asyncio.sleep(float(at) - elapsed)
+        elapsed = float(at)
+
+        Keys.instance.tap(int(key_number))
+
+
+def report(device):
+    from controller import config
+    from controller.core import motor, scheduler
+    from controller.menu import display
+
+    end = time.gmtime(sim.clock.clock.time())
+    print(f"Simulated until {time.strftime('%Y-%m-%d %H:%M', end)} UTC")
+
+    for pins in (config.MOTOR_OPEN_PINS, config.MOTOR_CLOSE_PINS):
+        for pin in pins:
+            pulses = sim.gpio.get_pulses(pin.name)
+            total = sum(length for _, length in pulses) / 1_000_000_000
+            print(f"{pin.name}: {len(pulses)} pulses, {total:.1f} s on")
+
+    print(f"Scheduler latency: {scheduler.latency}")
+    print(f"Motor timing [ms]: {motor.timing}")
+    print(f"NVM: {device.get_report()}")
+    print("Display:")
+    for line in display.get_display().get_text():
+        print(f"  |{line}")
+
+
+def main():
+    args = parse_args()
+    device = sim.install()
+
+    start = calendar.timegm(time.strptime(args.start, "%Y-%m-%dT%H:%M"))
+    sim.clock.clock.set_time(start)
+    sim.rtc.DS3231.lost_power_at_boot = args.lost_power
+    sim.rtc.DS3231.drift_ppm_at_boot = args.rtc_drift
+
+    store_settings(args.set)
+
+    from controller import config
+
+    config.KEYS_POLL_SLOW = max(config.KEYS_POLL_SLOW, args.poll_slow)
+
+    for override in args.config:
+        name, value = override.split("=", 1)
+        setattr(config, name, ast.literal_eval(value))
+
+    import asyncio
+
+    import code
+
+    async def run():
+        await asyncio.gather(code.main(), tap_keys(args.keys))
+
+    stdout = sys.stdout
+    if args.quiet:
+        sys.stdout = open(os.devnull, "w")
+
+    try:
+        sim.clock.run(run(), args.days * SECONDS_IN_A_DAY)
+    finally:
+        sys.stdout = stdout
+
+    report(device)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import asyncio
+import calendar
+import math
+import selectors
+import sys
+import time as real_time
+import types
+
+
+class VirtualClock:
+    def __init__(self):
+        self.now_ns = 0
+        self.epoch = 0
+
+    def advance(self, seconds):
+        # Rounding up guarantees that a timer due in a fraction of a ns fires
+        self.now_ns += math.ceil(seconds * 1_000_000_000)
+
+    def monotonic(self):
+        return self.now_ns / 1_000_000_000
+
+    def monotonic_ns(self):
+        return self.now_ns
+
+    def time(self):
+        return self.epoch + self.now_ns // 1_000_000_000
+
+    def set_time(self, timestamp):
+        self.epoch = int(timestamp) - self.now_ns // 1_000_000_000
+
+
+clock = VirtualClock()
+
+
+class VirtualSelector(selectors.DefaultSelector):
+    # Instead of blocking until the next timer is due, jump straight to it
+    def select(self, timeout=None):
+        if timeout:
+            clock.advance(timeout)
+
+        return super().select(0)
+
+
+class VirtualEventLoop(asyncio.SelectorEventLoop):
+    def __init__(self):
+        super().__init__(VirtualSelector())
+
+    def time(self):
+        return clock.monotonic()
+
+
+def mktime(t):
+    # CircuitPython has no time zones, so struct_time is always UTC here
+    return calendar.timegm(tuple(t))
+
+
+def localtime(secs=None):
+    return real_time.gmtime(clock.time() if secs is None else secs)
+
+
+def sleep(seconds):
+    clock.advance(seconds)
+
+
+def install():
+    module = types.ModuleType("time")
+    module.__getattr__ = lambda name: getattr(real_time, name)
+
+    module.struct_time = real_time.struct_time
+    module.mktime = mktime
+    module.localtime = localtime
+    module.sleep = sleep
+    module.time = clock.time
+    module.monotonic = clock.monotonic
+    module.monotonic_ns = clock.monotonic_ns
+
+    sys.modules["time"] = module
+
+
+def run(main, duration):
+    # Runs the coroutine on virtual time and cancels it after duration seconds
+    loop = VirtualEventLoop()
+
+    async def run_for():
+        try:
+            await asyncio.wait_for(main, duration)
+        except asyncio.TimeoutError:
+            pass
+
+    try:
+        loop.run_until_complete(run_for())
+    finally:
+        loop.close()
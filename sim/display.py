@@ -0,0 +1,322 @@
+import sys
+import types
+
+from sim.clock import clock
+
+FONT_WIDTH = 6
+FONT_HEIGHT = 12
+
+
+class Group:
+    def __init__(self, *, x=0, y=0, scale=1):
+        self.x = x
+        self.y = y
+        self.scale = scale
+        self.hidden = False
+        self._items = []
+
+    def add(self, item):
+        # Like displayio, an item can only be in one group at a time
+        if getattr(item, "in_group", False):
+            raise ValueError("Layer already in a group")
+
+        item.in_group = True
+
+    def append(self, item):
+        self.add(item)
+        self._items.append(item)
+
+    def remove(self, item):
+        self._items.remove(item)
+        item.in_group = False
+
+    def __getitem__(self, index):
+        return self._items[index]
+
+    def __setitem__(self, index, item):
+        self.add(item)
+        self._items[index].in_group = False
+        self._items[index] = item
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(self._items)
+
+
+class Bitmap:
+    # Cumulative count and size of all bitmaps created, to track allocations
+    allocations = 0
+    allocated_bytes = 0
+
+    def __init__(self, width, height, value_count):
+        Bitmap.allocations += 1
+        Bitmap.allocated_bytes += width * height
+
+        self.width = width
+        self.height = height
+        self._data = bytearray(width * height)
+
+    def __getitem__(self, index):
+        x, y = index
+        return self._data[y * self.width + x]
+
+    def __setitem__(self, index, value):
+        x, y = index
+        self._data[y * self.width + x] = value
+
+    def fill(self, value):
+        for idx in range(len(self._data)):
+            self._data[idx] = value
+
+    def blit(self, x, y, source, *, x1=0, y1=0, x2=None, y2=None, skip_index=None):
+        # Like displayio.Bitmap.blit: the target corner has to be on the bitmap,
+        # the rest is clipped, and source pixels of skip_index are not copied
+        x2 = source.width if x2 is None else x2
+        y2 = source.height if y2 is None else y2
+
+        if not (0 <= x <= self.width and 0 <= y <= self.height):
+            raise ValueError("out of range of target")
+
+        for row in range(min(y2 - y1, self.height - y)):
+            for column in range(min(x2 - x1, self.width - x)):
+                value = source[x1 + column, y1 + row]
+                if value != skip_index:
+                    self[x + column, y + row] = value
+
+
+class Palette:
+    def __init__(self, color_count):
+        self._colors = [0] * color_count
+
+    def __getitem__(self, index):
+        return self._colors[index]
+
+    def __setitem__(self, index, color):
+        self._colors[index] = color
+
+
+class TileGrid:
+    def __init__(self, bitmap, *, pixel_shader, x=0, y=0):
+        self.bitmap = bitmap
+        self.pixel_shader = pixel_shader
+        self.x = x
+        self.y = y
+        self.hidden = False
+
+
+class Glyph:
+    def __init__(self, bitmap, tile_index, width, height):
+        self.bitmap = bitmap
+        self.tile_index = tile_index
+        self.width = width
+        self.height = height
+        self.dx = 0
+        self.dy = 0
+        self.shift_x = width
+        self.shift_y = 0
+
+
+class Font:
+    # Every printable ASCII glyph is a filled cell like the ones painted for
+    # labels. The first pixel of the cell holds the character code, so text
+    # can be read back from rasterized bitmaps.
+    GLYPH_WIDTH = 6
+    GLYPH_HEIGHT = 12
+    CELL_TOP = 2
+
+    def __init__(self):
+        self.bitmap = Bitmap(self.GLYPH_WIDTH * 128, self.GLYPH_HEIGHT, 2)
+
+        for code in range(33, 127):
+            left = code * self.GLYPH_WIDTH
+            for y in range(self.CELL_TOP, self.CELL_TOP + SH1106.CELL_HEIGHT - 1):
+                for x in range(left, left + self.GLYPH_WIDTH - 1):
+                    self.bitmap[x, y] = 1
+
+            self.bitmap[left, self.CELL_TOP] = code
+
+    def get_glyph(self, codepoint):
+        if not 32 <= codepoint < 127:
+            return None
+
+        return Glyph(self.bitmap, codepoint, self.GLYPH_WIDTH, self.GLYPH_HEIGHT)
+
+    def get_bounding_box(self):
+        return self.GLYPH_WIDTH, self.GLYPH_HEIGHT
+
+
+class Label(Group):
+    def __init__(self, font, *, text="", color=0xFFFFFF, **kwargs):
+        super().__init__(**kwargs)
+        self.font = font
+        self.color = color
+        self.bitmap = None
+        self.text = text
+
+    @property
+    def text(self):
+        return self._text
+
+    @text.setter
+    def text(self, text):
+        # Like bitmap_label, every text change rasterizes a new bitmap
+        self._text = text
+        self.bitmap = Bitmap(max(len(text), 1) * FONT_WIDTH, FONT_HEIGHT, 2)
+
+
+class I2CDisplay:
+    def __init__(self, i2c, *, device_address):
+        self.i2c = i2c
+        self.device_address = device_address
+
+
+class SH1106:
+    # Glyph cell used to paint labels into the framebuffer, like terminalio
+    CELL_WIDTH = 6
+    CELL_HEIGHT = 9
+
+    # A full frame is pushed page by page over a 100 kHz I2C bus, blocking the
+    # caller meanwhile: 3 command bytes and a row of data per page, 9 bits each
+    I2C_FREQUENCY = 100_000
+
+    def __init__(self, bus, *, width, height, auto_refresh=True, **kwargs):
+        self.bus = bus
+        self.width = width
+        self.height = height
+        self.auto_refresh = auto_refresh
+        self.root_group = None
+        self.shows = 0
+        self.refreshes = 0
+
+        # Page-organized like the controller RAM: one byte is 8 vertical pixels
+        self.framebuffer = bytearray(width * height // 8)
+        self._blank = bytes(len(self.framebuffer))
+
+        bits = (height // 8) * (width + 3) * 9
+        self.transfer_seconds = bits / SH1106.I2C_FREQUENCY
+
+    def show(self, group):
+        self.root_group = group
+        self.shows += 1
+
+    def refresh(self, **kwargs):
+        self.refreshes += 1
+
+        self.framebuffer[:] = self._blank
+
+        for item in self.get_visible_items():
+            if isinstance(item, Label):
+                self.paint(item)
+            elif isinstance(item, TileGrid):
+                self.paint_bitmap(item)
+
+        clock.advance(self.transfer_seconds)
+        return True
+
+    def get_visible_items(self):
+        if self.root_group is None or self.root_group.hidden:
+            return []
+
+        return [item for item in self.root_group if not item.hidden]
+
+    def paint_bitmap(self, tile_grid):
+        bitmap = tile_grid.bitmap
+
+        for y in range(min(bitmap.height, self.height - tile_grid.y)):
+            for x in range(min(bitmap.width, self.width - tile_grid.x)):
+                if bitmap[x, y]:
+                    self.set_pixel(tile_grid.x + x, tile_grid.y + y)
+
+    def paint(self, label):
+        top = max(label.y - self.CELL_HEIGHT // 2, 0)
+        bottom = min(top + self.CELL_HEIGHT - 1, self.height)
+
+        # Bit masks of the glyph cell in every page it spans
+        masks = []
+        for page in range(top // 8, (bottom - 1) // 8 + 1):
+            mask = 0
+            for y in range(max(top, page * 8), min(bottom, page * 8 + 8)):
+                mask |= 1 << (y - page * 8)
+
+            masks.append((page * self.width, mask))
+
+        for idx, char in enumerate(label.text):
+            if char == " ":
+                continue
+
+            left = label.x + idx * self.CELL_WIDTH
+            for x in range(left, min(left + self.CELL_WIDTH - 1, self.width)):
+                for offset, mask in masks:
+                    self.framebuffer[offset + x] |= mask
+
+    def set_pixel(self, x, y):
+        page, bit = divmod(y, 8)
+        self.framebuffer[page * self.width + x] |= 1 << bit
+
+    def get_pixel(self, x, y):
+        page, bit = divmod(y, 8)
+        return bool(self.framebuffer[page * self.width + x] & (1 << bit))
+
+    def get_text(self):
+        rows = self.height // self.CELL_HEIGHT
+        columns = self.width // self.CELL_WIDTH
+        lines = [[" "] * columns for _ in range(rows)]
+
+        for item in self.get_visible_items():
+            if isinstance(item, TileGrid):
+                self.read_bitmap(item, lines)
+
+        for label in self.get_visible_items():
+            if not isinstance(label, Label):
+                continue
+
+            row = label.y // self.CELL_HEIGHT
+            column = label.x // self.CELL_WIDTH
+
+            for idx, char in enumerate(label.text):
+                if 0 <= row < rows and 0 <= column + idx < columns:
+                    lines[row][column + idx] = char
+
+        return ["".join(line).rstrip() for line in lines]
+
+    def read_bitmap(self, tile_grid, lines):
+        # Finds the character codes the simulated font leaves in every cell
+        bitmap = tile_grid.bitmap
+
+        for row, line in enumerate(lines):
+            middle = int(self.CELL_HEIGHT * (row + 0.5))
+            y = middle - Font.GLYPH_HEIGHT // 2 + Font.CELL_TOP
+
+            for column in range(len(line)):
+                x = column * self.CELL_WIDTH
+                if (code := bitmap[x, y]) > 1:
+                    line[column] = chr(code)
+
+
+def install():
+    displayio = types.ModuleType("displayio")
+    displayio.Group = Group
+    displayio.Bitmap = Bitmap
+    displayio.Palette = Palette
+    displayio.TileGrid = TileGrid
+    displayio.I2CDisplay = I2CDisplay
+    displayio.release_displays = lambda: None
+
+    terminalio = types.ModuleType("terminalio")
+    terminalio.FONT = Font()
+
+    display_text = types.ModuleType("adafruit_display_text")
+    bitmap_label = types.ModuleType("adafruit_display_text.bitmap_label")
+    bitmap_label.Label = Label
+    display_text.bitmap_label = bitmap_label
+
+    sh1106 = types.ModuleType("adafruit_displayio_sh1106")
+    sh1106.SH1106 = SH1106
+
+    sys.modules["displayio"] = displayio
+    sys.modules["terminalio"] = terminalio
+    sys.modules["adafruit_display_text"] = display_text
+    sys.modules["adafruit_display_text.bitmap_label"] = bitmap_label
+    sys.modules["adafruit_displayio_sh1106"] = sh1106
@@ -0,0 +1,120 @@
+import sys
+import types
+
+from sim.clock import clock
+
+
+class Pin:
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return f"board.{self.name}"
+
+
+class Direction:
+    INPUT = "input"
+    OUTPUT = "output"
+
+
+class DigitalInOut:
+    # Every value change is appended as (monotonic ns, pin name, value)
+    transitions = []
+
+    def __init__(self, pin):
+        self.pin = pin
+        self.direction = Direction.INPUT
+        self._value = False
+
+    @property
+    def value(self):
+        return self._value
+
+    @value.setter
+    def value(self, value):
+        if value != self._value:
+            transition = (clock.monotonic_ns(), self.pin.name, value)
+            DigitalInOut.transitions.append(transition)
+
+        self._value = value
+
+    def deinit(self):
+        pass
+
+
+class PWMOut:
+    # Duty cycle changes are appended as (monotonic ns, pin name, duty cycle),
+    # switching on and off is also recorded like a DigitalInOut transition
+    levels = []
+
+    def __init__(self, pin, *, duty_cycle=0, frequency=500, **kwargs):
+        self.pin = pin
+        self.frequency = frequency
+        self._duty_cycle = 0
+        self.duty_cycle = duty_cycle
+
+    @property
+    def duty_cycle(self):
+        return self._duty_cycle
+
+    @duty_cycle.setter
+    def duty_cycle(self, duty_cycle):
+        if not 0 <= duty_cycle <= 0xFFFF:
+            raise ValueError("duty_cycle must be 0-65535")
+
+        now_ns = clock.monotonic_ns()
+
+        if duty_cycle != self._duty_cycle:
+            PWMOut.levels.append((now_ns, self.pin.name, duty_cycle))
+        if bool(duty_cycle) != bool(self._duty_cycle):
+            DigitalInOut.transitions.append((now_ns, self.pin.name, bool(duty_cycle)))
+
+        self._duty_cycle = duty_cycle
+
+    def deinit(self):
+        pass
+
+
+def get_pulses(pin_name):
+    # Returns (start ns, length ns) of every period the pin was driven high
+    pulses = []
+    start_ns = None
+
+    for timestamp_ns, name, value in DigitalInOut.transitions:
+        if name != pin_name:
+            continue
+
+        if value and start_ns is None:
+            start_ns = timestamp_ns
+        elif not value and start_ns is not None:
+            pulses.append((start_ns, timestamp_ns - start_ns))
+            start_ns = None
+
+    return pulses
+
+
+class I2C:
+    def __init__(self, scl, sda, **kwargs):
+        self.scl = scl
+        self.sda = sda
+
+
+def install():
+    board = types.ModuleType("board")
+    for idx in range(29):
+        setattr(board, f"GP{idx}", Pin(f"GP{idx}"))
+
+    digitalio = types.ModuleType("digitalio")
+    digitalio.DigitalInOut = DigitalInOut
+    digitalio.Direction = Direction
+
+    pwmio = types.ModuleType("pwmio")
+    pwmio.PWMOut = PWMOut
+
+    busio = types.ModuleType("busio")
+    busio.I2C = I2C
+
+    sys.modules["board"] = board
+    sys.modules["digitalio"] = digitalio
+    sys.modules["pwmio"] = pwmio
+    sys.modules["busio"] = busio
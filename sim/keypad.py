@@ -0,0 +1,67 @@
+import sys
+import types
+
+
+class Event:
+    def __init__(self, key_number=0, pressed=True):
+        self.key_number = key_number
+        self.pressed = pressed
+        self.released = not pressed
+
+    def __repr__(self):
+        state = "pressed" if self.pressed else "released"
+        return f"<Event: key_number {self.key_number} {state}>"
+
+
+class EventQueue:
+    def __init__(self):
+        self._events = []
+        self.overflowed = False
+
+    def get(self):
+        if not self._events:
+            return None
+
+        return self._events.pop(0)
+
+    def clear(self):
+        self._events.clear()
+
+    def __len__(self):
+        return len(self._events)
+
+
+class Keys:
+    # The last created device, so scripts can press keys on it
+    instance = None
+
+    def __init__(self, pins, *, value_when_pressed, pull=True, **kwargs):
+        self.key_count = len(pins)
+        self.events = EventQueue()
+
+        Keys.instance = self
+
+    def press(self, key_number):
+        self.events._events.append(Event(key_number, True))
+
+    def release(self, key_number):
+        self.events._events.append(Event(key_number, False))
+
+    def tap(self, key_number):
+        self.press(key_number)
+        self.release(key_number)
+
+    def reset(self):
+        self.events.clear()
+
+    def deinit(self):
+        pass
+
+
+def install():
+    keypad = types.ModuleType("keypad")
+    keypad.Keys = Keys
+    keypad.Event = Event
+    keypad.EventQueue = EventQueue
+
+    sys.modules["keypad"] = keypad
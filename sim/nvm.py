@@ -0,0 +1,77 @@
+import sys
+import types
+
+ERASED = 0xFF
+
+# Like on the RP2040, the 4 KB of NVM are a single flash sector
+SECTOR_SIZE = 4096
+
+
+class NVM:
+    def __init__(self, size=4096):
+        self.data = bytearray(bytes((ERASED,)) * size)
+        self.writes = [0] * size
+        self.erases = [0] * size
+        self.bytes_written = 0
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, index):
+        return self.data[index]
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            offsets = range(*index.indices(len(self.data)))
+            value = bytes(value)
+
+            if len(offsets) != len(value):
+                raise ValueError("NVM slice assignment must not change size")
+        else:
+            offsets = (index,)
+            value = (value,)
+
+        self.bytes_written += len(offsets)
+
+        # Erased bytes are programmed in place, a write over anything else
+        # erases and reprograms every sector it touches
+        if all(self.data[offset] == ERASED for offset in offsets):
+            for offset, byte in zip(offsets, value):
+                if byte != ERASED:
+                    self.writes[offset] += 1
+                    self.data[offset] = byte
+
+            return
+
+        for sector in sorted({offset // SECTOR_SIZE for offset in offsets}):
+            start = sector * SECTOR_SIZE
+            for offset in range(start, min(start + SECTOR_SIZE, len(self.data))):
+                self.erases[offset] += 1
+                self.writes[offset] += 1
+
+        for offset, byte in zip(offsets, value):
+            self.data[offset] = byte
+
+    def reset_counters(self):
+        self.writes = [0] * len(self.data)
+        self.erases = [0] * len(self.data)
+        self.bytes_written = 0
+
+    def get_report(self):
+        return {
+            "bytes": len(self.data),
+            "bytes_written": self.bytes_written,
+            "writes_total": sum(self.writes),
+            "writes_max": max(self.writes),
+            "erases_total": sum(self.erases),
+            "erases_max": max(self.erases),
+            "bytes_touched": sum(1 for count in self.writes if count),
+        }
+
+
+def install(size=4096):
+    module = types.ModuleType("microcontroller")
+    module.nvm = NVM(size)
+
+    sys.modules["microcontroller"] = module
+    return module.nvm
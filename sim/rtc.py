@@ -0,0 +1,54 @@
+import calendar
+import sys
+import time
+import types
+
+from sim.clock import clock
+
+
+class RTC:
+    @property
+    def datetime(self):
+        return time.gmtime(clock.time())
+
+    @datetime.setter
+    def datetime(self, value):
+        clock.set_time(calendar.timegm(tuple(value)))
+
+
+class DS3231:
+    # Set before the firmware creates the device to model a dead backup cell
+    lost_power_at_boot = False
+    drift_ppm_at_boot = 0
+
+    def __init__(self, i2c, *, drift_ppm=None):
+        self.i2c = i2c
+        self.drift_ppm = DS3231.drift_ppm_at_boot if drift_ppm is None else drift_ppm
+        self.lost_power = DS3231.lost_power_at_boot
+
+        self._reference = clock.time()
+        self._reference_ns = clock.monotonic_ns()
+
+    @property
+    def datetime(self):
+        elapsed = (clock.monotonic_ns() - self._reference_ns) / 1_000_000_000
+        drift = elapsed * self.drift_ppm / 1_000_000
+
+        return time.gmtime(int(self._reference + elapsed + drift))
+
+    @datetime.setter
+    def datetime(self, value):
+        self._reference = calendar.timegm(tuple(value))
+        self._reference_ns = clock.monotonic_ns()
+        self.lost_power = False
+
+
+def install():
+    rtc = types.ModuleType("rtc")
+    rtc.RTC = RTC
+
+    ds3231 = types.ModuleType("adafruit_ds3231")
+    ds3231.DS3231 = DS3231
+
+    sys.modules["rtc"] = rtc
+    sys.modules["adafruit_ds3231"] = ds3231
@@ -1,3 +1,16 @@
 #!/usr/bin/env bash
 
-rsync -ruv controller code.py "/media/$USER/CIRCUITPY"
+set -e
+
+TARGET="/media/$USER/CIRCUITPY"
+
+# Only files whose contents changed are copied. Pass --source to deploy the
+# raw sources instead of the compiled bundle, e.g. to compare boot times.
+if [ "$1" = "--source" ]; then
+    rsync -rcv --delete --exclude __pycache__ controller/ "$TARGET/controller/"
+else
+    python build.py
+    rsync -rcv --delete build/controller/ "$TARGET/controller/"
+fi
+
+rsync -cv code.py "$TARGET"